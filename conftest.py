@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_without_pool(settings):
+    """Миниатюры создаются сразу: задача пула пережила бы тест и писала
+    бы в базу, которую тест уже очищает."""
+    settings.THUMBNAIL_ASYNC = False
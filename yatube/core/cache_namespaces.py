@@ -0,0 +1,67 @@
+"""
+Versioned cache namespaces.
+
+Every cache key built inside a namespace carries the namespace version,
+so the key stays valid for as long as nothing relevant is written. A write
+bumps the version and all keys of the namespace become unreachable at
+once; the stale entries are left to the cache eviction.
+
+A version is the time of the last write to the namespace in
+microseconds (or a little later, see ``bump``), so the versions of a
+page also tell when it last changed.
+
+Writes bump their namespaces with ``bump_on_commit``: a version bumped
+before the commit would let a concurrent reader cache the old data under
+it, and the stale entry would live until the next write.
+"""
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'namespace_version:%s'
+
+
+def _seed():
+    # A version that has been evicted is recreated from the clock, so it
+    # never repeats a value that was handed out before.
+    return time.time_ns() // 1000
+
+
+def modified_time(versions):
+    """The time of the last write to any of the namespaces, in seconds."""
+    return max(versions) // 1000000
+
+
+def get_versions(namespaces):
+    """Returns the current versions of the namespaces, in order."""
+    keys = [VERSION_KEY % namespace for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _seed(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_version(namespace):
+    return get_versions([namespace])[0]
+
+
+def bump(*namespaces):
+    """Invalidates every key built inside the namespaces."""
+    now = _seed()
+    keys = {VERSION_KEY % namespace for namespace in namespaces}
+    versions = cache.get_many(keys)
+    # Two writes within the same microsecond still get two versions.
+    cache.set_many({
+        key: max(versions[key] + 1, now) if key in versions else now
+        for key in keys
+    }, None)
+
+
+def bump_on_commit(*namespaces, using=None):
+    """Bumps the namespaces once the current transaction commits, or at
+    once outside a transaction."""
+    transaction.on_commit(partial(bump, *namespaces), using=using)
@@ -1,22 +1,64 @@
-from django.core.cache import cache
 from django.core.paginator import Paginator, Page
+from django.utils.functional import cached_property
+
+from .cache_namespaces import get_versions
+from .stampede import fetch
 
 
 class CachedPaginator(Paginator):
-    """A paginator that caches the results on a page by page basis."""
+    """
+    A paginator that caches the results on a page by page basis.
+
+    The keys are built inside versioned namespaces (the cache key itself
+    by default), so a page stays cached until a write bumps one of them.
+    Pages are filled through ``core.stampede.fetch``: after a bump only
+    one request queries the page again, and the others get the page as
+    it was before the write in the meantime.
+
+    ``dump`` turns the objects of a page into what is cached, ``load``
+    turns that back into the objects; by default the objects are cached
+    as they are.
+    """
     def __init__(self,
                  object_list,
                  per_page,
                  cache_key,
                  cache_timeout=300,
                  orphans=0,
-                 allow_empty_first_page=True):
+                 allow_empty_first_page=True,
+                 namespaces=None,
+                 dump=list,
+                 load=list):
         super(CachedPaginator, self).__init__(object_list,
                                               per_page,
                                               orphans,
                                               allow_empty_first_page)
         self.cache_key = cache_key
         self.cache_timeout = cache_timeout
+        self.namespaces = (namespaces if namespaces is not None
+                           else (cache_key,))
+        self.dump = dump
+        self.load = load
+
+    @cached_property
+    def version(self):
+        """The combined version of all namespaces of this paginator."""
+        return '.'.join(str(version)
+                        for version in get_versions(self.namespaces))
+
+    @cached_property
+    def count(self):
+        """
+        Returns the total number of objects, across all pages.
+
+        The count is cached next to the pages under the same versioned key,
+        so a cached page does not run ``SELECT COUNT(*)`` either; num_pages
+        and page_range are derived from it without touching the database.
+        """
+        return fetch(self.build_cache_key('count'),
+                     lambda: super(CachedPaginator, self).count,
+                     self.cache_timeout,
+                     self.build_stale_key('count'))
 
     def page(self, number):
         """
@@ -30,19 +72,24 @@ class CachedPaginator(Paginator):
         if number is None:
             number = 1
         number = self.validate_number(number)
-        cached_object_list = cache.get(self.build_cache_key(number), None)
+        payload = fetch(self.build_cache_key(number),
+                        lambda: self._fetch_payload(number),
+                        self.cache_timeout,
+                        self.build_stale_key(number))
+        return Page(self.load(payload), number, self)
 
-        if cached_object_list is not None:
-            page = Page(cached_object_list, number, self)
-        else:
-            page = super(CachedPaginator, self).page(number)
-            # Since the results are fresh, cache it.
-            cache.set(self.build_cache_key(number),
-                      page.object_list,
-                      self.cache_timeout)
-
-        return page
+    def _fetch_payload(self, number):
+        return self.dump(super(CachedPaginator, self).page(number).object_list)
 
     def build_cache_key(self, page_number):
-        """Appends the relevant pagination bits to the cache key."""
-        return "%s:%s:%s" % (self.cache_key, self.per_page, page_number)
+        """Appends the version and pagination bits to the cache key."""
+        return "%s:%s:%s:%s" % (self.cache_key,
+                                self.version,
+                                self.per_page,
+                                page_number)
+
+    def build_stale_key(self, page_number):
+        """The key of the last page computed under any version."""
+        return "%s:stale:%s:%s" % (self.cache_key,
+                                   self.per_page,
+                                   page_number)
@@ -0,0 +1,193 @@
+"""
+Two-tier cache shared between worker processes.
+
+``TieredCache`` puts a small in-process cache (L1) in front of a cache
+every worker sees (L2): a directory of files on the same host, or a
+memcached server. A read that misses L1 falls through to L2 and copies
+the value into L1 for ``L1_TIMEOUT`` seconds, so hot keys do not cross
+the process boundary on every request; writes go to both tiers.
+
+L1 can only be that short-lived because almost everything cached here is
+built inside a versioned namespace (see ``core.cache_namespaces``) and
+never changes under its key. The version keys themselves do change, so
+keys starting with one of ``L1_BYPASS`` are kept in L2 only: a write in
+one worker is then seen by the others on their next request. Other keys
+that are read, changed and written back must be listed there too.
+
+``cache_settings()`` builds ``CACHES`` from ``CACHE_*`` variables.
+"""
+import os
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache_namespaces import VERSION_KEY
+
+L1_TIMEOUT = 10
+L1_MAX_ENTRIES = 1000
+# The file cache culls a third of its files past this many entries.
+FILE_MAX_ENTRIES = 10000
+L1_BYPASS = (VERSION_KEY.split('%')[0],)
+SHARED_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+LOCAL_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """A cache that reads through an in-process cache to a shared one.
+
+    ``OPTIONS`` name the aliases of both tiers in ``CACHES``: ``L1`` and
+    ``L2``, and may override ``L1_TIMEOUT`` and ``L1_BYPASS``.
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__({**params, 'OPTIONS': {}})
+        self._l1_alias = options['L1']
+        self._l2_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', L1_TIMEOUT)
+        self.l1_bypass = tuple(options.get('L1_BYPASS', L1_BYPASS))
+
+    @property
+    def l1(self):
+        return caches[self._l1_alias]
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _local(self, key):
+        return not key.startswith(self.l1_bypass)
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version)
+        if added and self._local(key):
+            self.l1.set(key, value, self._l1_timeout(timeout), version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        if self._local(key):
+            value = self.l1.get(key, _MISSING, version)
+            if value is not _MISSING:
+                return value
+        value = self.l2.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        if self._local(key):
+            self.l1.set(key, value, self.l1_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+        if self._local(key):
+            self.l1.set(key, value, self._l1_timeout(timeout), version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(key, version)
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version)
+        self.l2.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = self.l1.get_many(
+            [key for key in keys if self._local(key)], version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version)
+            local = {key: value for key, value in shared.items()
+                     if self._local(key)}
+            if local:
+                self.l1.set_many(local, self.l1_timeout, version)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version)
+        local = {key: value for key, value in data.items()
+                 if self._local(key) and key not in failed}
+        if local:
+            self.l1.set_many(local, self._l1_timeout(timeout), version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l1.delete_many(keys, version)
+        self.l2.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return ((self._local(key) and self.l1.has_key(key, version))
+                or self.l2.has_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version)
+        return self.l2.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self.l1.delete(key, version)
+        return self.l2.decr(key, delta, version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l1.close(**kwargs)
+        self.l2.close(**kwargs)
+
+
+def cache_settings(base_dir, environ=os.environ, default='locmem',
+                   l1_bypass=()):
+    """``CACHES`` described by the environment.
+
+    ``CACHE_BACKEND`` is ``locmem`` (every process on its own), ``file``
+    (a directory shared by the processes of one host, ``CACHE_LOCATION``
+    or ``base_dir/cache``) or ``memcached`` (a server at
+    ``CACHE_LOCATION``). The shared backends are used through
+    ``TieredCache``; keys starting with ``l1_bypass`` skip its L1.
+    """
+    backend = environ.get('CACHE_BACKEND', default)
+    if backend == 'locmem':
+        return {'default': {'BACKEND': LOCAL_BACKEND}}
+    if backend not in SHARED_BACKENDS:
+        raise ImproperlyConfigured(
+            f'CACHE_BACKEND must be locmem or one of '
+            f'{", ".join(SHARED_BACKENDS)}, not {backend!r}')
+    shared = {'BACKEND': SHARED_BACKENDS[backend]}
+    if backend == 'file':
+        shared['LOCATION'] = environ.get('CACHE_LOCATION',
+                                         os.path.join(base_dir, 'cache'))
+        shared['OPTIONS'] = {'MAX_ENTRIES': FILE_MAX_ENTRIES}
+    else:
+        shared['LOCATION'] = environ.get('CACHE_LOCATION', '127.0.0.1:11211')
+    l1_timeout = int(environ.get('CACHE_L1_TIMEOUT', L1_TIMEOUT))
+    return {
+        'default': {
+            'BACKEND': 'core.caches.TieredCache',
+            'OPTIONS': {
+                'L1': 'local',
+                'L2': 'shared',
+                'L1_TIMEOUT': l1_timeout,
+                'L1_BYPASS': L1_BYPASS + tuple(l1_bypass),
+            },
+        },
+        'local': {
+            'BACKEND': LOCAL_BACKEND,
+            'LOCATION': 'l1',
+            'TIMEOUT': l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': L1_MAX_ENTRIES},
+        },
+        'shared': shared,
+    }
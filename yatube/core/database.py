@@ -0,0 +1,87 @@
+"""
+Database settings from the environment.
+
+``database_settings()`` builds the ``default`` entry of ``DATABASES``
+from ``DB_*`` variables, so the same settings file serves development
+(an SQLite file next to the project) and production (PostgreSQL, possibly
+behind PgBouncer). Connections are kept for ``DB_CONN_MAX_AGE`` seconds
+instead of being opened for every request.
+
+SQLite gets its pragmas from ``configure_sqlite``, a ``connection_created``
+receiver: in WAL mode readers do not block the writer, and the busy
+timeout makes a writer wait for the lock instead of failing at once
+with "database is locked".
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+DEFAULT_CONN_MAX_AGE = 60
+# Seconds a connection waits for another writer's lock.
+SQLITE_TIMEOUT = 20
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # With WAL, NORMAL only syncs at checkpoints and stays consistent.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+}
+# PgBouncer in transaction mode gives every transaction a different
+# server connection, so cursors must not outlive a transaction.
+POOLERS = {
+    'pgbouncer': {'DISABLE_SERVER_SIDE_CURSORS': True},
+}
+
+
+def _conn_max_age(value):
+    # "none" keeps connections open for good, as CONN_MAX_AGE=None does.
+    return None if value.lower() == 'none' else int(value)
+
+
+def database_settings(base_dir, environ=os.environ):
+    """The ``default`` database described by the environment.
+
+    ``DB_ENGINE`` defaults to SQLite in ``base_dir/db.sqlite3``; other
+    engines read ``DB_NAME``, ``DB_USER``, ``DB_PASSWORD``, ``DB_HOST``
+    and ``DB_PORT``. ``DB_POOL`` names the pooler in front of the
+    database, if any.
+    """
+    engine = environ.get('DB_ENGINE', SQLITE_ENGINE)
+    database = {
+        'ENGINE': engine,
+        'CONN_MAX_AGE': _conn_max_age(
+            environ.get('DB_CONN_MAX_AGE', str(DEFAULT_CONN_MAX_AGE))),
+    }
+    if engine == SQLITE_ENGINE:
+        database['NAME'] = environ.get(
+            'DB_NAME', os.path.join(base_dir, 'db.sqlite3'))
+        database['OPTIONS'] = {
+            'timeout': int(environ.get('DB_TIMEOUT', SQLITE_TIMEOUT)),
+        }
+        return database
+    database.update(
+        NAME=environ.get('DB_NAME', ''),
+        USER=environ.get('DB_USER', ''),
+        PASSWORD=environ.get('DB_PASSWORD', ''),
+        HOST=environ.get('DB_HOST', ''),
+        PORT=environ.get('DB_PORT', ''),
+    )
+    pool = environ.get('DB_POOL')
+    if pool:
+        if pool not in POOLERS:
+            raise ImproperlyConfigured(
+                f'DB_POOL must be one of {", ".join(POOLERS)}, not {pool!r}')
+        database.update(POOLERS[pool])
+    return database
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Applies ``SQLITE_PRAGMAS`` to every new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    timeout = connection.settings_dict.get('OPTIONS', {}).get(
+        'timeout', SQLITE_TIMEOUT)
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
@@ -0,0 +1,91 @@
+"""
+Bounded decoding and re-encoding of uploaded images.
+
+Uploads are checked by their header before anything is decoded: the
+size in bytes, the side length and the pixel count must stay within
+``IMAGE_UPLOAD_MAX_SIZE``, ``IMAGE_MAX_SIDE`` and ``IMAGE_MAX_PIXELS``.
+An accepted image is decoded once, shrunk to fit ``IMAGE_STORED_SIDE``
+and saved again without its metadata, so stored files stay small and
+later thumbnailing is cheap. Animated images are rejected: only the
+first frame would survive the re-encoding.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Header bytes read while looking for the image size.
+HEADER_LIMIT = 256 * 1024
+JPEG_QUALITY = 85
+
+# Photos stay JPEG, everything else becomes PNG: it keeps transparency
+# and, unlike GIF, is not limited to 256 colours.
+OUTPUT_FORMATS = {
+    'JPEG': ('JPEG', '.jpg', 'image/jpeg'),
+}
+DEFAULT_OUTPUT = ('PNG', '.png', 'image/png')
+
+
+class ImageRejected(ValueError):
+    """The upload must not be decoded. ``code`` names the reason."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def check_size(size):
+    width, height = size
+    if max(width, height) > settings.IMAGE_MAX_SIDE:
+        raise ImageRejected('too_wide')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageRejected('too_many_pixels')
+
+
+def read_header(data):
+    """
+    Returns the image size from the first bytes of the file, or None when
+    more bytes are needed. Nothing but the header is parsed.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise ImageRejected('too_many_pixels')
+    except (OSError, SyntaxError):
+        return None
+
+
+def reencode(upload):
+    """
+    Decodes the checked upload within the size limits and returns it
+    re-encoded without metadata.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        check_size(image.size)
+        if getattr(image, 'is_animated', False):
+            raise ImageRejected('animated')
+        output_format, extension, content_type = OUTPUT_FORMATS.get(
+            image.format, DEFAULT_OUTPUT
+        )
+        bounds = (settings.IMAGE_STORED_SIDE, settings.IMAGE_STORED_SIDE)
+        # JPEG can be decoded straight at a fraction of its size.
+        image.draft('RGB', bounds)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(bounds)
+        if output_format == 'JPEG':
+            image = image.convert('RGB')
+            options = {'quality': JPEG_QUALITY, 'optimize': True,
+                       'progressive': True}
+        else:
+            if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                image = image.convert('RGBA')
+            options = {'optimize': True}
+        buffer = io.BytesIO()
+        # Only pixels are written: EXIF, ICC and text chunks are dropped.
+        image.save(buffer, output_format, **options)
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
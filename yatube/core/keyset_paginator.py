@@ -0,0 +1,172 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage(Page):
+    """A page located by an opaque cursor instead of a page number."""
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super(KeysetPage, self).__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = paginator.last_cursor
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(Paginator):
+    """
+    A paginator that seeks by the values of the ordering columns.
+
+    Every page is fetched with ``WHERE (a, b) < (x, y) ORDER BY a, b LIMIT n``,
+    so page 1000 costs exactly as much as page 1: there is neither
+    ``COUNT(*)`` nor ``OFFSET``. The last column of ``ordering`` must be
+    unique to make the order total.
+    """
+    FORWARD = 'a'
+    BACKWARD = 'b'
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        super(KeysetPaginator, self).__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+
+    @property
+    def last_cursor(self):
+        """Cursor of the last page: the first rows in reverse order."""
+        return self.encode_cursor(self.BACKWARD, None)
+
+    def get_page(self, cursor):
+        """
+        Return a valid page, even if the cursor is malformed: a broken
+        cursor yields the first page.
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor):
+        """Returns a KeysetPage for the given cursor (None is page one)."""
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        else:
+            direction, values = self.FORWARD, None
+        forward = direction == self.FORWARD
+        object_list = self.object_list.order_by(
+            *(self.ordering if forward else self._reversed_ordering())
+        )
+        if values is not None:
+            object_list = object_list.filter(self._seek(values, forward))
+        rows = list(object_list[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            # In the direction of travel there is more only if the extra
+            # row was fetched; behind the cursor there is always the row
+            # it was built from.
+            more_ahead = has_more if forward else values is not None
+            more_behind = values is not None if forward else has_more
+            if more_ahead:
+                next_cursor = self.cursor_after(rows[-1])
+            if more_behind:
+                previous_cursor = self.cursor_before(rows[0])
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def bind(self, page):
+        """
+        Attach keyset cursors to an ordinary numbered page, so that moving
+        on from it does not fall back to ``OFFSET``.
+        """
+        page.next_cursor = (
+            self.cursor_after(page[len(page) - 1]) if page.has_next() else None
+        )
+        page.previous_cursor = (
+            self.cursor_before(page[0]) if page.has_previous() else None
+        )
+        page.last_cursor = self.last_cursor
+        return page
+
+    def cursor_after(self, obj):
+        return self.encode_cursor(self.FORWARD, self._values_of(obj))
+
+    def cursor_before(self, obj):
+        return self.encode_cursor(self.BACKWARD, self._values_of(obj))
+
+    def encode_cursor(self, direction, values):
+        # isoformat() keeps microseconds, DjangoJSONEncoder would cut them.
+        payload = json.dumps([direction, values],
+                             default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(
+            payload.encode()
+        ).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(
+                cursor + '=' * (-len(cursor) % 4)
+            )
+            direction, values = json.loads(payload.decode())
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise InvalidCursor('That cursor is not valid')
+        if direction not in (self.FORWARD, self.BACKWARD):
+            raise InvalidCursor('That cursor is not valid')
+        if values is None:
+            return direction, None
+        if (not isinstance(values, list)
+                or len(values) != len(self.ordering)):
+            raise InvalidCursor('That cursor is not valid')
+        try:
+            values = [self._field(name).to_python(value)
+                      for name, value in zip(self._names(), values)]
+        except ValidationError:
+            raise InvalidCursor('That cursor is not valid')
+        return direction, values
+
+    def _names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _values_of(self, obj):
+        return [getattr(obj, name) for name in self._names()]
+
+    def _reversed_ordering(self):
+        return tuple(name[1:] if name.startswith('-') else '-' + name
+                     for name in self.ordering)
+
+    def _seek(self, values, forward):
+        """Builds ``(a < x) OR (a = x AND b < y) OR ...`` for the cursor."""
+        condition = Q()
+        equal = {}
+        for ordering, value in zip(self.ordering, values):
+            name = ordering.lstrip('-')
+            descending = ordering.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{'%s__%s' % (name, lookup): value})
+            equal[name] = value
+        return condition
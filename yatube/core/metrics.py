@@ -0,0 +1,267 @@
+"""
+Per-request performance metrics.
+
+``MetricsMiddleware`` collects, for every request, the number of SQL
+queries and the time spent in them (through ``execute_wrapper`` on
+every connection), the time spent rendering templates (through the
+``InstrumentedTemplates`` backend), the paginator cache hits and misses
+(``core.stampede``) and the time spent generating thumbnails. The
+figures go back to the client in a ``Server-Timing`` header and into
+histograms labelled with the view name, which ``render`` writes out in
+the Prometheus text format for the metrics endpoint.
+
+The histograms live in the memory of each process: with several worker
+processes, every one of them has to be scraped. Work done outside a
+request, such as thumbnails made by the background pool, is recorded
+under the ``BACKGROUND_VIEW`` label.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+PREFIX = 'yatube_'
+UNRESOLVED_VIEW = '<unresolved>'
+BACKGROUND_VIEW = '<background>'
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_local = threading.local()
+
+
+class Timings:
+    """What one request has spent so far."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.templates = 0.0
+        self.thumbnails = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_depth = 0
+
+    def server_timing(self, total):
+        entries = [
+            'db;dur=%.1f;desc="%d queries"' % (self.sql * 1000,
+                                               self.queries),
+            'tpl;dur=%.1f' % (self.templates * 1000),
+        ]
+        if self.cache_hits or self.cache_misses:
+            entries.append('cache;desc="%d hits, %d misses"' % (
+                self.cache_hits, self.cache_misses))
+        if self.thumbnails:
+            entries.append('thumb;dur=%.1f' % (self.thumbnails * 1000))
+        entries.append('total;dur=%.1f' % (total * 1000))
+        return ', '.join(entries)
+
+
+def current():
+    """The ``Timings`` of the request this thread is handling, if any."""
+    return getattr(_local, 'timings', None)
+
+
+def record(name, value=1):
+    """Adds ``value`` to a figure of the current request."""
+    timings = current()
+    if timings is not None:
+        setattr(timings, name, getattr(timings, name) + value)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time the block takes to a figure of the current request,
+    or, outside a request, observes it under ``BACKGROUND_VIEW``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if current() is not None:
+            record(name, elapsed)
+        else:
+            REGISTRY.histograms[name].observe(BACKGROUND_VIEW, elapsed)
+
+
+class Histogram:
+    """Cumulative histogram of values per view, Prometheus style."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.views = {}
+
+    def observe(self, view, value):
+        with REGISTRY.lock:
+            counts, total = self.views.get(
+                view, ([0] * (len(self.buckets) + 1), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self.views[view] = (counts, total + value)
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help_text),
+                 '# TYPE %s histogram' % self.name]
+        for view, (counts, total) in sorted(self.views.items()):
+            label = _escape(view)
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                lines.append('%s_bucket{view="%s",le="%s"} %d'
+                             % (self.name, label, bound, count))
+            lines.append('%s_sum{view="%s"} %r' % (self.name, label, total))
+            lines.append('%s_count{view="%s"} %d'
+                         % (self.name, label, counts[-1]))
+        return lines
+
+
+class Counter:
+    """Monotonic count per view."""
+
+    def __init__(self, name, help_text):
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self.views = {}
+
+    def add(self, view, value):
+        with REGISTRY.lock:
+            self.views[view] = self.views.get(view, 0) + value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help_text),
+                 '# TYPE %s counter' % self.name]
+        for view, value in sorted(self.views.items()):
+            lines.append('%s{view="%s"} %d'
+                         % (self.name, _escape(view), value))
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"')
+
+
+class Registry:
+    """All metrics of the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {
+            'total': Histogram('request_duration_seconds',
+                               'Time to handle a request.', SECONDS_BUCKETS),
+            'queries': Histogram('db_queries',
+                                 'SQL queries per request.', QUERIES_BUCKETS),
+            'sql': Histogram('db_query_duration_seconds',
+                             'Time spent in SQL per request.',
+                             SECONDS_BUCKETS),
+            'templates': Histogram('template_render_seconds',
+                                   'Time spent rendering templates per '
+                                   'request.', SECONDS_BUCKETS),
+            'thumbnails': Histogram('thumbnail_seconds',
+                                    'Time spent generating thumbnails.',
+                                    SECONDS_BUCKETS),
+        }
+        self.counters = {
+            'cache_hits': Counter('paginator_cache_hits_total',
+                                  'Paginator cache hits.'),
+            'cache_misses': Counter('paginator_cache_misses_total',
+                                    'Paginator cache misses.'),
+        }
+
+    def observe_request(self, view, timings, total):
+        histograms = self.histograms
+        histograms['total'].observe(view, total)
+        histograms['queries'].observe(view, timings.queries)
+        histograms['sql'].observe(view, timings.sql)
+        histograms['templates'].observe(view, timings.templates)
+        if timings.thumbnails:
+            histograms['thumbnails'].observe(view, timings.thumbnails)
+        for name, counter in self.counters.items():
+            value = getattr(timings, name)
+            if value:
+                counter.add(view, value)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for metric in (*self.histograms.values(),
+                           *self.counters.values()):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _execute(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record('queries')
+        record('sql', time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """Measures every request; goes first in ``MIDDLEWARE`` to see the
+    whole of it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = Timings()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute))
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED_VIEW
+        REGISTRY.observe_request(view, timings, total)
+        response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        timings = current()
+        if timings is None or timings.template_depth:
+            # Templates rendered from inside another one are already
+            # counted in its time.
+            return super().render(context, request)
+        timings.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_depth -= 1
+            timings.templates += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, timing what requests render."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code),
+                                    self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
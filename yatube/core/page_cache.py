@@ -0,0 +1,177 @@
+"""
+Rendered page cache with holes for per-user fragments.
+
+A page is rendered once into a skeleton: every fragment that depends on
+the visitor is left out as a hole marker (see the ``hole`` template tag)
+and the rest of the HTML is cached under the versions of the page's
+namespaces. A request then only renders the small hole templates into
+the skeleton; anonymous visitors get a fully filled copy from the cache
+without rendering anything at all.
+
+The same versions make the page's validators: the ETag hashes them
+with the visitor and the path, and Last-Modified is the time of the
+last write to the namespaces. A conditional GET that still matches is
+answered with 304 before the view runs, whether the page cache is
+enabled or not. A page rendered from stale values that ``core.stampede``
+served during a recompute is sent as it is, without being cached and
+without validators.
+
+Hole markers are signed with ``SECRET_KEY``: a marker typed by a user
+into a post or a comment ends up in the skeleton as well, and it must
+not make the page render a template of the user's choosing. Markers
+with a bad signature are dropped.
+"""
+import hashlib
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+
+from .cache_namespaces import get_versions, modified_time
+from .stampede import tracking_stale
+
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_:=-]+)-->')
+HOLE_SALT = 'core.page_cache.hole'
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def make_hole(template_name, params):
+    """Returns the marker the skeleton keeps in place of a fragment."""
+    return '<!--hole:%s-->' % signing.dumps([template_name, params],
+                                            salt=HOLE_SALT)
+
+
+def fill_holes(request, skeleton):
+    """Renders every hole of the skeleton for the current visitor; markers
+    that were not made by ``make_hole`` are dropped."""
+    def render_hole(match):
+        try:
+            template_name, params = signing.loads(match.group(1),
+                                                  salt=HOLE_SALT)
+        except signing.BadSignature:
+            return ''
+        return render_to_string(template_name, params, request=request)
+    return HOLE_RE.sub(render_hole, skeleton)
+
+
+def is_html(response):
+    return response.get('Content-Type', '').startswith('text/html')
+
+
+def build_page_key(kind, versions, request):
+    # Only the parameters the views read, in a fixed order: any others
+    # would make a new entry for every made-up query string.
+    query = urlencode([(name, request.GET[name])
+                       for name in settings.PAGE_CACHE_PARAMS
+                       if name in request.GET])
+    path = hashlib.md5(
+        ('%s?%s' % (request.path, query)).encode()).hexdigest()
+    return 'page:%s:%s:%s' % (
+        kind, '.'.join(str(version) for version in versions), path
+    )
+
+
+def get_skeleton(view, request, args, kwargs, versions):
+    """
+    Returns the cached ``(skeleton, content_type)`` of the page, rendering
+    it on a miss, or the response itself when it must not be cached:
+    only HTML pages are.
+    """
+    skeleton_key = build_page_key('skeleton', versions, request)
+    cached = cache.get(skeleton_key)
+    if cached is not None:
+        return cached
+    request.page_skeleton = True
+    try:
+        with tracking_stale() as served_stale:
+            response = view(request, *args, **kwargs)
+    finally:
+        request.page_skeleton = False
+    if response.streaming or not is_html(response):
+        # Holes are made only by templates: in any other content a
+        # marker is data and is left alone.
+        return response
+    if response.status_code != 200 or served_stale():
+        # A page built from data older than the versions would stay in
+        # the cache under them until the next write.
+        response.content = fill_holes(
+            request, response.content.decode(response.charset)
+        )
+        return response
+    cached = (response.content.decode(response.charset),
+              response['Content-Type'])
+    cache.set(skeleton_key, cached, settings.PAGE_CACHE_TIMEOUT)
+    return cached
+
+
+def build_etag(versions, request):
+    """The ETag of the page as this visitor sees it."""
+    return quote_etag(hashlib.md5(('%s:%s:%s' % (
+        '.'.join(str(version) for version in versions),
+        request.user.pk,
+        request.get_full_path(),
+    )).encode()).hexdigest())
+
+
+def render_page(view, request, args, kwargs, versions):
+    """The page from the cache, rendering whatever is missing."""
+    if not settings.PAGE_CACHE_ENABLED:
+        return view(request, *args, **kwargs)
+    anonymous = not request.user.is_authenticated
+    page_key = build_page_key('anonymous', versions, request)
+    if anonymous:
+        cached = cache.get(page_key)
+        if cached is not None:
+            return HttpResponse(cached[0], content_type=cached[1])
+
+    cached = get_skeleton(view, request, args, kwargs, versions)
+    if isinstance(cached, HttpResponse):
+        return cached
+    content = fill_holes(request, cached[0])
+    if anonymous:
+        cache.set(page_key, (content, cached[1]),
+                  settings.PAGE_CACHE_TIMEOUT)
+    return HttpResponse(content, content_type=cached[1])
+
+
+def cache_page_with_holes(namespaces):
+    """
+    Caches the rendered view under the versions of its namespaces and
+    answers conditional requests from the same versions.
+
+    ``namespaces(request, *args, **kwargs)`` returns the namespaces the
+    page depends on, or None when the page must not be cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in CACHEABLE_METHODS:
+                return view(request, *args, **kwargs)
+            page_namespaces = namespaces(request, *args, **kwargs)
+            if page_namespaces is None:
+                return view(request, *args, **kwargs)
+            versions = get_versions(page_namespaces)
+            etag = build_etag(versions, request)
+            last_modified = modified_time(versions)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            served_stale = None
+            if response is None:
+                with tracking_stale() as served_stale:
+                    response = render_page(view, request, args, kwargs,
+                                           versions)
+            if served_stale is not None and served_stale():
+                # The validators would have the client keep old data.
+                return response
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(last_modified))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+"""
+Cache fills that do not stampede.
+
+When a popular key goes missing (a write bumped its namespace version,
+or it expired), every request that comes in before it is filled again
+would run the same query. ``fetch`` lets only the request that takes the
+key's lock recompute it; the others are served the last value computed
+for the key under any version (stale-while-revalidate), or, if there is
+none yet, wait for the new value for up to ``WAIT_TIMEOUT`` seconds.
+A stale value is marked on the current thread (see ``tracking_stale``),
+so that whatever is built from it is not cached under the new versions.
+
+A key that expires is refreshed a little before it does, with the
+probability growing as expiry nears and with the time the value takes
+to compute ("XFetch", Vattani et al., "Optimal Probabilistic Cache
+Stampede Prevention"), so expiry rarely meets a crowd at all.
+"""
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+from .metrics import record
+
+LOCK_KEY = 'lock:%s'
+# Longer than any recompute should take: a crashed worker's lock expires.
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 3.0
+POLL_INTERVAL = 0.05
+# Values above 1 refresh earlier, below 1 later.
+XFETCH_BETA = 1.0
+
+_local = threading.local()
+
+
+@contextmanager
+def tracking_stale():
+    """Yields a callable telling whether ``fetch`` has served a stale
+    value on this thread inside the block."""
+    if not hasattr(_local, 'blocks'):
+        _local.blocks = []
+    served = []
+    _local.blocks.append(served)
+    try:
+        yield lambda: bool(served)
+    finally:
+        _local.blocks.remove(served)
+
+
+def _refresh_early(delta, expires):
+    if expires is None:
+        return False
+    gap = -delta * XFETCH_BETA * math.log(1.0 - random.random())
+    return time.time() + gap >= expires
+
+
+def _store(key, compute, timeout, stale_key):
+    record('cache_misses')
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    expires = None if timeout is None else time.time() + timeout
+    cache.set(key, (value, delta, expires), timeout)
+    if stale_key is not None:
+        cache.set(stale_key, value, None)
+    return value
+
+
+def _recompute(key, compute, timeout, stale_key):
+    try:
+        return _store(key, compute, timeout, stale_key)
+    finally:
+        cache.delete(LOCK_KEY % key)
+
+
+def _wait(key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if not cache.has_key(LOCK_KEY % key):
+            break
+    return None
+
+
+def fetch(key, compute, timeout=None, stale_key=None):
+    """
+    Returns the value cached under ``key``, calling ``compute()`` to fill
+    it at most once at a time.
+
+    ``stale_key`` keeps the last computed value for good; the values are
+    served from it while another request recomputes ``key``.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if (not _refresh_early(delta, expires)
+                or not cache.add(LOCK_KEY % key, True, LOCK_TIMEOUT)):
+            record('cache_hits')
+            return value
+        return _recompute(key, compute, timeout, stale_key)
+    if cache.add(LOCK_KEY % key, True, LOCK_TIMEOUT):
+        return _recompute(key, compute, timeout, stale_key)
+    if stale_key is not None:
+        stale = cache.get(stale_key)
+        if stale is not None:
+            record('cache_hits')
+            for served in getattr(_local, 'blocks', ()):
+                served.append(key)
+            return stale
+    entry = _wait(key)
+    if entry is not None:
+        record('cache_hits')
+        return entry[0]
+    # The recompute takes too long or has failed: do not wait any more.
+    return _store(key, compute, timeout, stale_key)
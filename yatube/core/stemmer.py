@@ -0,0 +1,101 @@
+"""
+Russian Snowball stemmer.
+
+A direct implementation of the Snowball algorithm for Russian
+(https://snowballstem.org/algorithms/russian/stemmer.html), used to
+reduce words to a common stem before they go into the search index.
+Words that are not Cyrillic are only lowercased.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+# Every pattern is anchored at the end of the word, so the leftmost match
+# the search finds is also the longest ending, as the algorithm requires.
+# Endings of the first groups must follow "а" or "я", which stays.
+PERFECTIVE_GERUND = re.compile(
+    r'(?:ив|ивши|ившись|ыв|ывши|ывшись|(?<=[ая])(?:в|вши|вшись))$'
+)
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|'
+    r'их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'(?:ивш|ывш|ующ|(?<=[ая])(?:ем|нн|вш|ющ|щ))$')
+VERB = re.compile(
+    r'(?:ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю|'
+    r'(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно))$'
+)
+NOUN = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'(?:ост|ость)$')
+SUPERLATIVE = re.compile(r'(?:ейш|ейше)$')
+
+
+def _region_start(word, start):
+    """Index after the first non-vowel that follows a vowel."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _cut(pattern, rv):
+    match = pattern.search(rv)
+    if match is None:
+        return rv, False
+    return rv[:match.start()], True
+
+
+def _step1(rv):
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if found:
+        return rv
+    rv, _ = _cut(REFLEXIVE, rv)
+    rv, found = _cut(ADJECTIVE, rv)
+    if found:
+        rv, _ = _cut(PARTICIPLE, rv)
+        return rv
+    rv, found = _cut(VERB, rv)
+    if found:
+        return rv
+    rv, _ = _cut(NOUN, rv)
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv_start = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2_start = _region_start(word, _region_start(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rv, found = _cut(SUPERLATIVE, rv)
+        if found and rv.endswith('нн'):
+            rv = rv[:-1]
+        elif not found and rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def stems(text):
+    """Stems of every word of the text, in order."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,63 @@
+"""
+Content-addressed file storage.
+
+Every file is stored once under the SHA-256 digest of its bytes, in the
+directory the field asked for and with the original extension kept for
+format detection: ``posts/<digest>.gif``. The digest is computed while
+the upload is streamed into a temporary file next to its final place,
+so the content is read only once. Saving bytes that are already stored
+returns the existing name and drops the copy; identical uploads share
+one file and, through it, one set of thumbnails.
+
+Since files are shared, a file must not be deleted while anything still
+refers to it. Saving bytes that are already stored touches the file, so
+a sweep that spares young files also spares one just taken into use.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DEFAULT_FILE_MODE = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def digest_name(self, name, digest):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest + extension)
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.upload-', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            name = self.digest_name(name, digest.hexdigest())
+            if self.exists(name):
+                os.remove(temporary)
+                os.utime(self.path(name))
+            else:
+                os.chmod(temporary,
+                         self.file_permissions_mode or DEFAULT_FILE_MODE)
+                # Concurrent uploads of the same bytes replace each other
+                # with identical content, which is harmless.
+                os.replace(temporary, self.path(name))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name.replace('\\', '/')
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import make_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """Фрагмент страницы, который зависит от посетителя.
+
+    При сборке скелета страницы для кэша вместо фрагмента остаётся
+    метка, и фрагмент отрисовывается уже для каждого запроса. Шаблон
+    фрагмента может опираться только на params и данные запроса.
+    """
+    request = context.get('request')
+    if getattr(request, 'page_skeleton', False):
+        return mark_safe(make_hole(template_name, params))
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**params):
+        return fragment.render(context)
@@ -0,0 +1,47 @@
+"""
+Upload handler that checks images while they are streamed to disk.
+
+Every upload goes to a temporary file, so memory per request stays flat
+whatever the file size. On the way the handler reads the image header
+and stops storing a file as soon as it is too large in bytes or pixels;
+the file then carries ``upload_error`` with the reason, and the form
+reports it without decoding anything.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from .images import HEADER_LIMIT, ImageRejected, check_size, read_header
+
+
+class StreamingImageUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.file.image_size = None
+        self.file.upload_error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.file.upload_error:
+            return None
+        self.received += len(raw_data)
+        try:
+            if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+                raise ImageRejected('too_large')
+            self.check_header(raw_data)
+        except ImageRejected as rejected:
+            self.file.upload_error = rejected.code
+            return None
+        self.file.write(raw_data)
+
+    def check_header(self, raw_data):
+        if self.file.image_size or self.header is None:
+            return
+        self.header += raw_data
+        self.file.image_size = read_header(self.header)
+        if self.file.image_size:
+            check_size(self.file.image_size)
+        if self.file.image_size or len(self.header) >= HEADER_LIMIT:
+            # Not an image we can read: the form rejects it later.
+            self.header = None
@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core.metrics import REGISTRY
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
 
 
 def page_not_found(request, exception):
@@ -8,7 +15,8 @@ def page_not_found(request, exception):
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    # Клиенты JSON API узнают об отказе только по коду ответа.
+    return render(request, 'core/403csrf.html', status=403)
 
 
 def server_error(request, reason=''):
@@ -17,3 +25,18 @@ def server_error(request, reason=''):
 
 def permission_denied(request, reason=''):
     return render(request, 'core/403.html')
+
+
+def metrics(request):
+    # Метрики выдают устройство сайта, поэтому нужен токен. Адрес клиента
+    # ничего не доказывает: за прокси все запросы приходят с localhost.
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''),
+                                 f'Bearer {token}'):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(REGISTRY.render(),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Group, Post
+from .search import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +16,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идёт по индексу из posts.search, а не через LIKE.
+        if not search_term:
+            return queryset, False
+        return search(queryset, search_term), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
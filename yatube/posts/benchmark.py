@@ -0,0 +1,247 @@
+"""Синтетическая нагрузка на страницы постов.
+
+``seed`` заполняет базу данными, похожими на настоящие: популярность
+авторов распределена по степенному закону (Ципфа), поэтому немногие
+авторы пишут большую часть постов и собирают большую часть подписчиков,
+а популярные посты - большую часть комментариев. Данные загружаются
+пачками через posts.transfer, вместе со счётчиками, лентами и поиском.
+
+``run`` прогоняет через тестовый клиент Django сценарии, по одному на
+страницу, и для каждого считает задержки p50/p95/p99, запросы к базе на
+запрос и пропускную способность одного процесса. ``regressions``
+сравнивает результаты с сохранёнными результатами прошлого прогона.
+Всё вместе запускает команда ``benchmark_views`` на отдельной базе.
+"""
+import io
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from . import thumbnails, transfer
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+DATASET: dict = {
+    'users': 200,
+    'groups': 10,
+    'posts': 2000,
+    'comments': 5000,
+    'follows': 3000,
+}
+SCENARIOS: tuple = ('index', 'group_posts', 'profile', 'post_detail',
+                    'follow_index', 'post_create', 'add_comment')
+REQUESTS: int = 200
+WARMUP: int = 20
+PERCENTILES: tuple = (50, 95, 99)
+# Рост p95 больше чем на столько считается регрессией.
+THRESHOLD: float = 0.2
+ZIPF_EXPONENT: float = 1.1
+GROUP_SHARE: float = 0.7
+IMAGE_SHARE: float = 0.2
+IMAGE_COLORS: tuple = ('crimson', 'seagreen', 'steelblue', 'orange',
+                       'slateblue')
+IMAGE_SIZE: tuple = (1200, 800)
+FEED_PAGES: int = 5
+START_DATE = datetime(2022, 1, 1, tzinfo=timezone.utc)
+DATE_SPAN: int = 365 * 24 * 3600
+WORDS: tuple = (
+    'горы', 'море', 'город', 'дорога', 'книга', 'музыка', 'кино', 'кофе',
+    'утро', 'вечер', 'поход', 'друзья', 'работа', 'отпуск', 'фото',
+    'погода', 'осень', 'весна', 'лето', 'зима', 'река', 'лес', 'поезд',
+    'самолёт', 'выставка', 'концерт', 'рецепт', 'сад', 'кошка', 'собака',
+)
+
+
+def _zipf(rng, items: list):
+    """Бесконечный поток элементов items: первые выпадают чаще."""
+    cum_weights = list(accumulate(
+        1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(len(items))))
+    while True:
+        yield from rng.choices(items, cum_weights=cum_weights, k=1000)
+
+
+def _text(rng, shortest: int, longest: int) -> str:
+    return ' '.join(rng.choices(WORDS, k=rng.randint(shortest, longest)))
+
+
+def _date(rng) -> str:
+    return (START_DATE
+            + timedelta(seconds=rng.uniform(0, DATE_SPAN))).isoformat()
+
+
+def _images() -> list:
+    """Картинки для постов, сразу с миниатюрами."""
+    storage = Post._meta.get_field('image').storage
+    names = []
+    for color in IMAGE_COLORS:
+        content = io.BytesIO()
+        Image.new('RGB', IMAGE_SIZE, color).save(content, 'JPEG')
+        name = storage.save('posts/benchmark.jpg',
+                            ContentFile(content.getvalue()))
+        thumbnails.generate(name)
+        names.append(name)
+    return names
+
+
+def _load(name: str, rows) -> None:
+    for _ in transfer.load(name, rows):
+        pass
+
+
+def seed(rng, users: int, groups: int, posts: int, comments: int,
+         follows: int) -> dict:
+    """Заполняет пустую базу синтетическими данными.
+
+    Возвращает число записей каждой модели, которые получились: повторные
+    подписки и подписки на себя отбрасываются.
+    """
+    usernames = [f'user-{number}' for number in range(users)]
+    slugs = [f'group-{number}' for number in range(groups)]
+    images = _images()
+    _load('groups', ({'slug': slug, 'title': f'Группа {slug}',
+                      'description': _text(rng, 10, 30)} for slug in slugs))
+    authors = _zipf(rng, usernames)
+    _load('posts', (
+        {'id': pk, 'text': _text(rng, 5, 80), 'pub_date': _date(rng),
+         'author': next(authors),
+         'group': (rng.choice(slugs)
+                   if slugs and rng.random() < GROUP_SHARE else None),
+         'image': rng.choice(images) if rng.random() < IMAGE_SHARE else ''}
+        for pk in range(1, posts + 1)
+    ))
+    post_ids = _zipf(rng, list(range(1, posts + 1)))
+    commenters = _zipf(rng, usernames)
+    _load('comments', (
+        {'id': pk, 'post': next(post_ids), 'author': next(commenters),
+         'text': _text(rng, 3, 30), 'created': _date(rng)}
+        for pk in range(1, comments + 1)
+    ))
+    _load('follows', (
+        {'user': rng.choice(usernames), 'author': next(authors)}
+        for _ in range(follows)
+    ))
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+class Scenarios:
+    """Сценарии нагрузки: каждый метод делает один запрос к своей
+    странице. Страницы подписок, новых постов и комментариев смотрит
+    пользователь с самым большим числом подписок."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.groups = list(Group.objects.values_list('pk', 'slug'))
+        self.authors = _zipf(rng, list(
+            UserStats.objects.order_by('-posts_count', 'pk')
+            .values_list('user__username', flat=True)))
+        self.posts = _zipf(rng, list(
+            Post.objects.order_by('-comments_count', 'pk')
+            .values_list('pk', flat=True)))
+        self.guest = Client()
+        self.reader = Client()
+        self.reader.force_login(User.objects.get(pk=UserStats.objects.order_by(
+            '-following_count', 'pk').values_list('user_id', flat=True)[0]))
+
+    def page(self) -> dict:
+        return {'page': self.rng.randint(1, FEED_PAGES)}
+
+    def index(self):
+        return self.guest.get(reverse('posts:index'), self.page())
+
+    def group_posts(self):
+        _, slug = self.rng.choice(self.groups)
+        return self.guest.get(
+            reverse('posts:group_posts', kwargs={'slug': slug}), self.page())
+
+    def profile(self):
+        return self.guest.get(
+            reverse('posts:profile', kwargs={'username': next(self.authors)}),
+            self.page())
+
+    def post_detail(self):
+        return self.guest.get(reverse('posts:post_detail',
+                                      kwargs={'post_id': next(self.posts)}))
+
+    def follow_index(self):
+        return self.reader.get(reverse('posts:follow_index'), self.page())
+
+    def post_create(self):
+        group_id, _ = self.rng.choice(self.groups)
+        return self.reader.post(reverse('posts:post_create'), {
+            'text': _text(self.rng, 5, 80), 'group': group_id})
+
+    def add_comment(self):
+        return self.reader.post(
+            reverse('posts:add_comment', kwargs={'post_id': next(self.posts)}),
+            {'text': _text(self.rng, 3, 30)})
+
+
+def percentile(values: list, share: float) -> float:
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share / 100 * len(ordered)) - 1)]
+
+
+def measure(request, requests: int, warmup: int) -> dict:
+    """Задержки, запросы к базе и пропускная способность сценария."""
+    for _ in range(warmup):
+        request()
+    latencies, queries = [], []
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = request()
+            latencies.append(time.perf_counter() - begin)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{request.__name__}: ответ {response.status_code}')
+        queries.append(len(captured))
+    elapsed = time.perf_counter() - started
+    result = {'requests': requests}
+    for share in PERCENTILES:
+        result[f'p{share}_ms'] = percentile(latencies, share) * 1000
+    result['mean_ms'] = sum(latencies) / requests * 1000
+    result['queries'] = sum(queries) / requests
+    result['max_queries'] = max(queries)
+    result['rps'] = requests / elapsed
+    return result
+
+
+def run(rng, names=SCENARIOS, requests: int = REQUESTS,
+        warmup: int = WARMUP) -> dict:
+    """Результаты сценариев names по их именам."""
+    scenarios = Scenarios(rng)
+    return {name: measure(getattr(scenarios, name), requests, warmup)
+            for name in names}
+
+
+def regressions(current: dict, baseline: dict,
+                threshold: float = THRESHOLD) -> list:
+    """Сценарии, которые стали медленнее или делают больше запросов,
+    чем в прошлом прогоне."""
+    found = []
+    for name, result in current['views'].items():
+        old = baseline['views'].get(name)
+        if old is None:
+            continue
+        if result['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            found.append(f'{name}: p95 {old["p95_ms"]:.1f} -> '
+                         f'{result["p95_ms"]:.1f} мс')
+        if result['max_queries'] > old['max_queries']:
+            found.append(f'{name}: запросов {old["max_queries"]} -> '
+                         f'{result["max_queries"]}')
+    return found
@@ -0,0 +1,77 @@
+"""Пакетное добавление комментариев для импорта и ботов.
+
+Пакет проверяется целиком до записи: каждая запись - формой
+``BulkCommentForm``, все посты - одним запросом. Если хоть одна запись
+не прошла, не сохраняется ничего. Комментарии вставляются одним
+``bulk_create`` в одной транзакции, а счётчики и версии кэша меняются
+один раз на пост, а не на строку, как у сигналов из posts.signals.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from core.cache_namespaces import bump_on_commit
+from . import counters
+from .forms import BulkCommentForm
+from .models import Comment, Post
+from .utils import post_page
+
+MAX_BATCH: int = 500
+BATCH_SIZE: int = 500
+MISSING_POST: str = 'Такого поста нет.'
+
+
+def _validate(payloads) -> tuple:
+    """Формы записей пакета и ошибки по их номерам."""
+    forms, errors = [], {}
+    for number, payload in enumerate(payloads):
+        form = BulkCommentForm(payload if isinstance(payload, dict) else {})
+        if form.is_valid():
+            forms.append(form)
+        else:
+            errors[number] = form.errors.get_json_data()
+    return forms, errors
+
+
+def _missing_posts(forms) -> dict:
+    """Ошибки записей, чьих постов нет; посты проверяются одним
+    запросом."""
+    post_ids = {form.cleaned_data['post'] for form in forms}
+    existing = set(Post.objects.filter(pk__in=post_ids).order_by()
+                   .values_list('pk', flat=True))
+    return {
+        number: {'post': [{'message': MISSING_POST, 'code': 'missing'}]}
+        for number, form in enumerate(forms)
+        if form.cleaned_data['post'] not in existing
+    }
+
+
+def add_many(author, payloads) -> tuple:
+    """Добавляет комментарии author из словарей ``{'post': id, 'text': ...}``.
+
+    Возвращает число созданных комментариев и ошибки по номерам
+    записей; при ошибках не создаётся ни одного.
+    """
+    forms, errors = _validate(payloads)
+    if errors:
+        return 0, errors
+    with transaction.atomic():
+        # Проверка внутри транзакции: пост, удалённый между проверкой
+        # и вставкой, отклонит внешний ключ и откатит весь пакет.
+        errors = _missing_posts(forms)
+        if errors:
+            return 0, errors
+        comments = []
+        for form in forms:
+            comment = form.save(commit=False)
+            comment.author = author
+            comment.post_id = form.cleaned_data['post']
+            comments.append(comment)
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        per_post = Counter(comment.post_id for comment in comments)
+        counters.change(*(
+            (Post.objects.filter(pk=post_id), 'comments_count', delta)
+            for post_id, delta in per_post.items()
+        ))
+    bump_on_commit(*(post_page(post_id) for post_id in per_post))
+    return len(comments), {}
@@ -0,0 +1,60 @@
+"""Компактная запись постов для кэша страниц лент.
+
+Вместо экземпляров моделей с их ``_state`` и связанными объектами
+CachedPaginator кладёт в кэш кортеж плоских кортежей: только поля,
+которые выводят ленты. При чтении из них собираются посты с автором и
+группой, как после ``select_related``; остальные поля автора и группы
+отложены и в лентах не читаются.
+
+Сравнение с обычным pickle - команда ``benchmark_feed_payload``.
+"""
+from django.db.models.base import ModelState
+
+from .models import Group, Post, User
+
+POST_FIELDS: tuple = ('id', 'text', 'pub_date', 'author_id', 'group_id',
+                      'image', 'comments_count')
+AUTHOR_FIELDS: tuple = ('id', 'username', 'first_name', 'last_name')
+GROUP_FIELDS: tuple = ('id', 'title', 'slug')
+
+
+def dump_posts(posts) -> tuple:
+    """Посты ленты с выбранными автором и группой в виде кортежей."""
+    rows = []
+    for post in posts:
+        author, group = post.author, post.group
+        rows.append((
+            post.pk, post.text, post.pub_date, post.author_id,
+            post.group_id, post.image.name, post.comments_count,
+            author.username, author.first_name, author.last_name,
+            group.title if group else None, group.slug if group else None,
+        ))
+    return tuple(rows)
+
+
+def _instance(model, fields: tuple, values):
+    """Объект, загруженный из базы, без вызова __init__ модели.
+
+    Поля, которых нет в fields, отложены, как после ``only()``.
+    """
+    instance = model.__new__(model)
+    instance.__dict__.update(zip(fields, values))
+    instance._state = ModelState()
+    instance._state.adding = False
+    return instance
+
+
+def load_posts(rows) -> list:
+    """Посты из кортежей ``dump_posts``."""
+    posts = []
+    for row in rows:
+        post = _instance(Post, POST_FIELDS, row[:7])
+        post._state.fields_cache['author'] = _instance(
+            User, AUTHOR_FIELDS, (post.author_id, *row[7:10]))
+        group = None
+        if post.group_id is not None:
+            group = _instance(Group, GROUP_FIELDS,
+                              (post.group_id, *row[10:12]))
+        post._state.fields_cache['group'] = group
+        posts.append(post)
+    return posts
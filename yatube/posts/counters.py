@@ -0,0 +1,79 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Страницы читают готовые числа из ``UserStats``, ``Group.posts_count`` и
+``Post.comments_count`` вместо агрегатов. Сигналы меняют счётчики
+выражениями F() сразу после записи, поэтому одновременные записи не
+теряют обновлений. В режиме autocommit запись и счётчики фиксируются
+отдельно: если процесс упал между ними, счётчик отстанет. В одной
+транзакции они оказываются, только когда запись сама идёт внутри
+``transaction.atomic()``, как пачки загрузки в posts.transfer.
+Разошедшиеся с данными счётчики (после такого сбоя, загрузки фикстур,
+правки базы вручную) пересчитывает ``reconcile`` - команда
+``reconcile_counters``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Счётчик: модель, поле счётчика и подзапрос, который его пересчитывает.
+COUNTERS = (
+    (UserStats, 'posts_count', Post.objects, 'author', 'user'),
+    (UserStats, 'followers_count', Follow.objects, 'author', 'user'),
+    (UserStats, 'following_count', Follow.objects, 'user', 'user'),
+    (Group, 'posts_count', Post.objects, 'group', 'pk'),
+    (Post, 'comments_count', Comment.objects, 'post', 'pk'),
+)
+
+
+def count_of(queryset, field: str, outer: str = 'pk'):
+    """Подзапрос с числом строк queryset, у которых field совпадает
+    с полем outer внешнего запроса."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def change(*updates) -> None:
+    """Меняет счётчики одной транзакцией.
+
+    Каждое изменение - это ``(queryset, поле, приращение)``.
+    """
+    with transaction.atomic():
+        for queryset, field, delta in updates:
+            queryset.update(**{field: F(field) + delta})
+
+
+def user_stats(user_id: int):
+    return UserStats.objects.filter(user_id=user_id)
+
+
+def reconcile() -> dict:
+    """Пересчитывает разошедшиеся счётчики.
+
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    # Пользователи, созданные в обход сигналов, получают свои счётчики.
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)),
+        batch_size=500,
+    )
+    fixed = {}
+    for model, field, queryset, related, outer in COUNTERS:
+        actual = count_of(queryset, related, outer)
+        with transaction.atomic():
+            drifted = list(
+                model.objects.annotate(actual=actual)
+                .exclude(**{field: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            if drifted:
+                model.objects.filter(pk__in=drifted).update(**{field: actual})
+        fixed[f'{model._meta.label}.{field}'] = len(drifted)
+    return fixed
@@ -0,0 +1,168 @@
+"""Материализованная лента подписок.
+
+Новый пост сразу раскладывается по входящим лентам подписчиков
+(fan-out on write), и лента подписок читается одним проходом по индексу
+``FeedEntry(user, pub_date)``. У авторов с очень большим числом
+подписчиков раскладывать каждый пост слишком дорого: их посты
+подмешиваются в ленту при чтении (fan-out on read).
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+FANOUT_FOLLOWERS_LIMIT: int = 1000
+BATCH_SIZE: int = 500
+CELEBRITIES_CACHE_KEY: str = 'feed_celebrities'
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def celebrities() -> set:
+    """id авторов, чьи посты не раскладываются по лентам."""
+    authors = cache.get(CELEBRITIES_CACHE_KEY)
+    if authors is None:
+        authors = set(UserStats.objects.filter(
+            followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+        ).values_list('user_id', flat=True))
+        cache.set(CELEBRITIES_CACHE_KEY, authors, None)
+    return authors
+
+
+def _update_celebrity(author_id: int) -> bool:
+    """Пересчитывает, читается ли автор при чтении ленты.
+
+    Возвращает True, если автор только что перестал им быть.
+    """
+    authors = celebrities()
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+    is_celebrity = followers > FANOUT_FOLLOWERS_LIMIT
+    was_celebrity = author_id in authors
+    if is_celebrity != was_celebrity:
+        authors = set(authors)
+        if is_celebrity:
+            authors.add(author_id)
+        else:
+            authors.discard(author_id)
+        cache.set(CELEBRITIES_CACHE_KEY, authors, None)
+    return was_celebrity and not is_celebrity
+
+
+def _fill(user_ids, posts) -> None:
+    for user_id in user_ids:
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def fan_out(post: Post) -> None:
+    """Кладёт новый пост во входящие ленты подписчиков автора."""
+    if post.author_id in celebrities():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_many(posts) -> None:
+    """Раскладывает пачку новых постов, как ``fan_out``, одним запросом
+    подписчиков на всех авторов пачки."""
+    authors = {post.author_id for post in posts} - celebrities()
+    followers = defaultdict(list)
+    for author_id, user_id in Follow.objects.filter(
+            author_id__in=authors).values_list('author_id', 'user_id'):
+        followers[author_id].append(user_id)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for post in posts for user_id in followers[post.author_id]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow: Follow) -> None:
+    """Добавляет в ленту нового подписчика уже написанные посты автора."""
+    _update_celebrity(follow.author_id)
+    if follow.author_id in celebrities():
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).values_list('pk', 'pub_date')
+    _fill([follow.user_id], posts)
+
+
+def backfill_many(follows) -> None:
+    """Заполняет ленты пачки новых подписок, как ``backfill``: один
+    запрос за счётчиками авторов, один за их постами и одна вставка."""
+    author_ids = {follow.author_id for follow in follows}
+    counts = dict(UserStats.objects.filter(
+        user_id__in=author_ids
+    ).values_list('user_id', 'followers_count'))
+    authors = set(celebrities())
+    popular = {author_id for author_id in author_ids
+               if counts.get(author_id, 0) > FANOUT_FOLLOWERS_LIMIT}
+    updated = (authors - author_ids) | popular
+    if updated != authors:
+        cache.set(CELEBRITIES_CACHE_KEY, updated, None)
+    posts = defaultdict(list)
+    for author_id, pk, pub_date in Post.objects.filter(
+            author_id__in=author_ids - popular
+    ).values_list('author_id', 'pk', 'pub_date'):
+        posts[author_id].append((pk, pub_date))
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+         for follow in follows for pk, pub_date in posts[follow.author_id]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(follow: Follow) -> None:
+    """Убирает посты автора из ленты бывшего подписчика."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+    if _update_celebrity(follow.author_id):
+        # Посты автора читались при чтении ленты, теперь их нужно
+        # разложить по лентам всех оставшихся подписчиков.
+        posts = list(Post.objects.filter(
+            author_id=follow.author_id
+        ).values_list('pk', 'pub_date'))
+        followers = Follow.objects.filter(
+            author_id=follow.author_id
+        ).values_list('user_id', flat=True)
+        _fill(followers.iterator(), posts)
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан пользователь.
+
+    Посты упорядочены по ``FEED_ORDERING``: для обычного случая это
+    поля входящей ленты, и сортировку даёт индекс.
+    """
+    authors = celebrities()
+    followed_celebrities = list(Follow.objects.filter(
+        user=user, author_id__in=authors
+    ).values_list('author_id', flat=True)) if authors else []
+    if not followed_celebrities:
+        posts = Post.objects.feed().filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        )
+    else:
+        inbox = FeedEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.feed().filter(
+            Q(pk__in=inbox) | Q(author_id__in=followed_celebrities)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+    return posts.order_by(*FEED_ORDERING)
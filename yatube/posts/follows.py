@@ -0,0 +1,79 @@
+"""Подписки без проверки перед записью.
+
+Повторную подписку отклоняет уникальный индекс ``unique_following``,
+поэтому подписка - это одна вставка без проверки, и двойной клик или
+два одновременных запроса не создают второй строки. Отписка - удаление
+по фильтру, тоже без проверки; Django перед ним выбирает удаляемую
+строку, чтобы передать её сигналам post_delete. Счётчики, ленты и кэш
+страниц обновляют сигналы из posts.signals.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+
+from core.cache_namespaces import bump_on_commit
+from . import counters, feeds
+from .models import Follow
+from .utils import profile_page
+
+BATCH_SIZE: int = 500
+
+
+def follow(user, author) -> bool:
+    """Подписывает user на author.
+
+    Возвращает False, если подписка уже была или это сам user.
+    """
+    if user.pk == author.pk:
+        return False
+    try:
+        # Точка сохранения: ошибка вставки не ломает внешнюю транзакцию.
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author) -> bool:
+    """Отписывает user от author. Возвращает False, если подписки не было."""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
+
+
+def follow_many(pairs) -> int:
+    """Создаёт подписки из пар ``(id подписчика, id автора)`` пачками.
+
+    Для загрузки данных: вместо сигналов на каждую строку счётчики
+    меняются одним обновлением на пользователя. Уже существующие
+    подписки и подписки на себя пропускаются. Возвращает число
+    созданных подписок.
+    """
+    pairs = {(user_id, author_id) for user_id, author_id in pairs
+             if user_id != author_id}
+    if not pairs:
+        return 0
+    user_ids = {user_id for user_id, _ in pairs}
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user_id__in=user_ids).values_list('user_id', 'author_id'))
+        new = [Follow(user_id=user_id, author_id=author_id)
+               for user_id, author_id in pairs - existing]
+        if not new:
+            return 0
+        # Подписки, вставленные за это время другим запросом, отклонит
+        # индекс; их счётчики выправит reconcile_counters.
+        Follow.objects.bulk_create(new, batch_size=BATCH_SIZE,
+                                   ignore_conflicts=True)
+        followers = Counter(entry.author_id for entry in new)
+        following = Counter(entry.user_id for entry in new)
+        counters.change(
+            *((counters.user_stats(author_id), 'followers_count', delta)
+              for author_id, delta in followers.items()),
+            *((counters.user_stats(user_id), 'following_count', delta)
+              for user_id, delta in following.items()),
+        )
+        feeds.backfill_many(new)
+    bump_on_commit(*(profile_page(pk)
+                     for pk in followers.keys() | following.keys()))
+    return len(new)
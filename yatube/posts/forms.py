@@ -1,6 +1,15 @@
 from django import forms
+
+from core.images import ImageRejected, reencode
 from .models import Post, Comment
 
+IMAGE_ERRORS: dict = {
+    'too_large': 'Файл картинки слишком большой.',
+    'too_wide': 'Картинка слишком большая по ширине или высоте.',
+    'too_many_pixels': 'В картинке слишком много точек.',
+    'animated': 'Анимированные картинки не поддерживаются.',
+}
+
 
 class PostForm(forms.ModelForm):
 
@@ -8,6 +17,31 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        upload = self.files.get('image')
+        error = getattr(upload, 'upload_error', None)
+        if error:
+            # Файл сохранён не целиком, и поле не сможет его открыть:
+            # вместо общей ошибки показываем причину.
+            field = self.fields['image']
+            field.error_messages = {**field.error_messages,
+                                    'empty': IMAGE_ERRORS[error],
+                                    'invalid_image': IMAGE_ERRORS[error]}
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not hasattr(image, 'image'):
+            # Картинка не загружалась: поле пустое или осталось прежним.
+            return image
+        error = getattr(image, 'upload_error', None)
+        try:
+            if error:
+                raise ImageRejected(error)
+            return reencode(image)
+        except ImageRejected as rejected:
+            raise forms.ValidationError(IMAGE_ERRORS[rejected.code])
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if data == '':
@@ -26,3 +60,8 @@ class CommentForm(forms.ModelForm):
         if data == '':
             raise forms.ValidationError('Напечатайте текст комментария.')
         return data
+
+
+class BulkCommentForm(CommentForm):
+    """Комментарий из пакета: вместе с текстом приходит id поста."""
+    post = forms.IntegerField(min_value=1)
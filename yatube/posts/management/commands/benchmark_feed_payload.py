@@ -0,0 +1,76 @@
+import pickle
+import timeit
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from posts.compact import dump_posts, load_posts
+from posts.models import Group, Post, User
+from posts.views import POSTS_ON_PAGE
+
+REPEAT: int = 2000
+TEXT_LENGTH: int = 500
+
+
+def sample_page(posts_on_page: int) -> list:
+    """Страница постов в том виде, в каком её выбирает лента: со всеми
+    полями автора и группы."""
+    posts = []
+    for number in range(posts_on_page):
+        author = User.from_db('default', None, [
+            field.get_default() if not field.primary_key else number + 1
+            for field in User._meta.concrete_fields
+        ])
+        author.username = f'author-{number}'
+        author.first_name, author.last_name = 'Имя', 'Фамилия'
+        author.password = 'pbkdf2_sha256$150000$' + 'x' * 66
+        group = Group.from_db('default', None, [
+            number + 1, f'Группа {number}', f'group-{number}',
+            f'Описание группы {number} ' * 10, number,
+        ])
+        post = Post.from_db('default', None, [
+            number + 1, f'Текст поста {number} ' * (TEXT_LENGTH // 15),
+            datetime(2022, 1, 1, number % 24, tzinfo=timezone.utc),
+            author.pk, group.pk, f'posts/{"0" * 64}.jpg', number,
+        ])
+        Post.author.field.set_cached_value(post, author)
+        Post.group.field.set_cached_value(post, group)
+        posts.append(post)
+    return posts
+
+
+def measure(dump, load, repeat: int) -> tuple:
+    """Размер записи в кэше и время записи и чтения страницы в мкс."""
+    payload = pickle.dumps(dump(), pickle.HIGHEST_PROTOCOL)
+    write = timeit.timeit(
+        lambda: pickle.dumps(dump(), pickle.HIGHEST_PROTOCOL),
+        number=repeat)
+    read = timeit.timeit(lambda: load(pickle.loads(payload)), number=repeat)
+    return len(payload), write / repeat * 1e6, read / repeat * 1e6
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер и время (де)сериализации страницы ленты '
+            'в кэше: экземпляры моделей и компактные кортежи')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=POSTS_ON_PAGE,
+            help='Постов на странице')
+        parser.add_argument(
+            '--repeat', type=int, default=REPEAT,
+            help='Сколько раз повторить каждое измерение')
+
+    def handle(self, *args, **options):
+        posts = sample_page(options['posts'])
+        results = {
+            'pickle моделей': measure(lambda: list(posts), list,
+                                      options['repeat']),
+            'компактные кортежи': measure(lambda: dump_posts(posts),
+                                          load_posts, options['repeat']),
+        }
+        self.stdout.write(f'{"":<20}{"байт":>10}{"запись, мкс":>14}'
+                          f'{"чтение, мкс":>14}')
+        for name, (size, write, read) in results.items():
+            self.stdout.write(f'{name:<20}{size:>10}{write:>14.1f}'
+                              f'{read:>14.1f}')
@@ -0,0 +1,116 @@
+import json
+import random
+import tempfile
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.caches import cache_settings
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Заполняет отдельную базу синтетическими данными и замеряет '
+            'задержки, запросы к базе и пропускную способность страниц')
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DATASET.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать: {name}')
+        parser.add_argument(
+            '--views', nargs='+', choices=benchmark.SCENARIOS,
+            default=benchmark.SCENARIOS, help='Какие страницы замерять')
+        parser.add_argument(
+            '--requests', type=int, default=benchmark.REQUESTS,
+            help='Запросов к каждой странице')
+        parser.add_argument(
+            '--warmup', type=int, default=benchmark.WARMUP,
+            help='Запросов перед замером')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одно зерно - одни и те же данные')
+        parser.add_argument(
+            '--cache', choices=('locmem', 'file'), default='file',
+            help='Кэш на время замера; файловый - во временном каталоге')
+        parser.add_argument(
+            '--no-page-cache', action='store_true',
+            help='Выключить кэш готовых страниц')
+        parser.add_argument(
+            '--output', help='Сохранить результаты в файл JSON')
+        parser.add_argument(
+            '--baseline', help='Сравнить с результатами из файла JSON')
+        parser.add_argument(
+            '--threshold', type=float, default=benchmark.THRESHOLD,
+            help='Допустимый рост p95, доля')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media, \
+                tempfile.TemporaryDirectory() as cache_location:
+            # Замер не трогает ни рабочую базу, ни её кэш и файлы.
+            caches = cache_settings(settings.BASE_DIR, environ={
+                'CACHE_BACKEND': options['cache'],
+                'CACHE_LOCATION': cache_location,
+            })
+            with override_settings(
+                    DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                    CACHES=caches, MEDIA_ROOT=media, THUMBNAIL_ASYNC=False,
+                    PAGE_CACHE_ENABLED=not options['no_page_cache']):
+                report = self.benchmark(options)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['threshold'])
+
+    def benchmark(self, options) -> dict:
+        rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            dataset = benchmark.seed(rng, **{
+                name: options[name] for name in benchmark.DATASET})
+            views = benchmark.run(rng, options['views'],
+                                  options['requests'], options['warmup'])
+        except RuntimeError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        return {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'seed': options['seed'],
+            'dataset': dataset,
+            'settings': {
+                'database': connection.vendor,
+                'cache': options['cache'],
+                'page_cache': not options['no_page_cache'],
+            },
+            'views': views,
+        }
+
+    def print_report(self, report):
+        dataset = ', '.join(f'{name} {count}'
+                            for name, count in report['dataset'].items())
+        self.stdout.write(f'Данные: {dataset}')
+        self.stdout.write(
+            f'{"":<14}' + ''.join(f'{f"p{share}, мс":>10}'
+                                  for share in benchmark.PERCENTILES)
+            + f'{"запросов":>10}{"в секунду":>11}')
+        for name, result in report['views'].items():
+            self.stdout.write(
+                f'{name:<14}' + ''.join(f'{result[f"p{share}_ms"]:>10.1f}'
+                                        for share in benchmark.PERCENTILES)
+                + f'{result["queries"]:>10.1f}{result["rps"]:>11.1f}')
+
+    def compare(self, report, path, threshold):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        found = benchmark.regressions(report, baseline, threshold)
+        if found:
+            raise CommandError('Регрессии:\n' + '\n'.join(found))
+        self.stdout.write(self.style.SUCCESS(f'Регрессий нет, база: {path}'))
@@ -0,0 +1,43 @@
+import posixpath
+import re
+
+from django.core.management.base import BaseCommand
+
+from core.cache_namespaces import bump
+from posts.models import Post
+from posts.utils import FEEDS_NAMESPACE
+
+# Имя, которое хранилище уже дало по содержимому файла.
+DIGEST_NAME = re.compile(r'(^|/)[0-9a-f]{64}(\.[^/]*)?$')
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов под имена по содержимому: '
+            'одинаковые картинки остаются одним файлом')
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+        stored = (set(storage.listdir(directory)[1])
+                  if storage.exists(directory) else set())
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct()
+        moved = reclaimed = 0
+        for name in list(names):
+            if DIGEST_NAME.search(name) or not storage.exists(name):
+                continue
+            with storage.open(name) as image:
+                new_name = storage.save(name, image)
+            Post.objects.filter(image=name).update(image=new_name)
+            moved += 1
+            reclaimed += storage.size(name)
+            storage.delete(name)
+            if posixpath.basename(new_name) not in stored:
+                # Первая копия этих байтов остаётся на диске.
+                stored.add(posixpath.basename(new_name))
+                reclaimed -= storage.size(new_name)
+        if moved:
+            bump(FEEDS_NAMESPACE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, освобождено байт: {reclaimed}'))
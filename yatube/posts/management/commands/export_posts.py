@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+from posts.models import Post
+
+WORKERS: int = 8
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в каталог: '
+            'по файлу JSON Lines или CSV на модель')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl',
+            help='Формат файлов')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз')
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Скопировать картинки постов в каталог media')
+        parser.add_argument(
+            '--workers', type=int, default=WORKERS,
+            help='Число потоков копирования картинок')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+        for name in transfer.MODELS:
+            path = os.path.join(directory, f'{name}.{options["format"]}')
+            started = time.monotonic()
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count = transfer.write(
+                    stream, options['format'], transfer.COLUMNS[name],
+                    transfer.exported(name).iterator(
+                        chunk_size=options['chunk_size']))
+            self.stdout.write(
+                f'{name}: {transfer.rate(count, time.monotonic() - started)}')
+        if options['images']:
+            started = time.monotonic()
+            copied = transfer.copy_images(
+                Post.objects.exclude(image='').order_by('pk').values_list(
+                    'image', flat=True).iterator(
+                        chunk_size=options['chunk_size']),
+                Post._meta.get_field('image').storage,
+                FileSystemStorage(os.path.join(directory, 'media')),
+                options['workers'])
+            self.stdout.write(
+                f'Картинок скопировано: {copied}, '
+                f'{time.monotonic() - started:.1f} с')
+        self.stdout.write(self.style.SUCCESS(f'Выгружено в {directory}'))
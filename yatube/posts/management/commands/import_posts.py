@@ -0,0 +1,97 @@
+import os
+import time
+from itertools import islice
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+from posts.models import Post
+
+WORKERS: int = 8
+# Сколько занятых id показать в ошибке.
+SHOWN_CONFLICTS: int = 10
+
+
+def find(directory: str, name: str) -> tuple:
+    """Файл модели в каталоге и его формат."""
+    for format in transfer.FORMATS:
+        path = os.path.join(directory, f'{name}.{format}')
+        if os.path.exists(path):
+            return path, format
+    return None, None
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из каталога, '
+            'выгруженного командой export_posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами')
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Сколько записей вставлять за раз')
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Скопировать картинки постов из каталога media')
+        parser.add_argument(
+            '--workers', type=int, default=WORKERS,
+            help='Число потоков копирования картинок')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'Нет каталога {directory}')
+        for name in transfer.IDENTITIES:
+            self.check_conflicts(directory, name, options['batch_size'])
+        for name in transfer.MODELS:
+            path, format = find(directory, name)
+            if path is None:
+                continue
+            self.load(name, path, format, options['batch_size'])
+        if options['images']:
+            self.copy_images(directory, options['workers'],
+                             options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено. Миниатюры создаст команда warm_thumbnails'))
+
+    def check_conflicts(self, directory, name, batch_size):
+        path, format = find(directory, name)
+        if path is None:
+            return
+        with open(path, encoding='utf-8', newline='') as stream:
+            found = list(islice(transfer.conflicts(
+                name, transfer.read(stream, format), batch_size),
+                SHOWN_CONFLICTS))
+        if found:
+            raise CommandError(
+                f'{name}: id {", ".join(map(str, found))} в базе заняты '
+                f'другими записями. Загрузите данные в пустую базу')
+
+    def load(self, name, path, format, batch_size):
+        started = time.monotonic()
+        read = created = 0
+        with open(path, encoding='utf-8', newline='') as stream:
+            for batch_read, batch_created in transfer.load(
+                    name, transfer.read(stream, format), batch_size):
+                read += batch_read
+                created += batch_created
+        self.stdout.write(
+            f'{name}: {transfer.rate(read, time.monotonic() - started)}, '
+            f'создано {created}, пропущено {read - created}')
+
+    def copy_images(self, directory, workers, batch_size):
+        path, format = find(directory, 'posts')
+        if path is None:
+            return
+        storage = Post._meta.get_field('image').storage
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as stream:
+            copied = transfer.copy_images(
+                (row['image'] for row in transfer.read(stream, format)
+                 if row['image']),
+                FileSystemStorage(os.path.join(directory, 'media')),
+                FileSystemStorage(storage.location, storage.base_url),
+                workers, batch_size)
+        self.stdout.write(f'Картинок скопировано: {copied}, '
+                          f'{time.monotonic() - started:.1f} с')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.cache_namespaces import bump
+from posts import counters
+from posts.utils import FEEDS_NAMESPACE
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile()
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: исправлено строк: {rows}')
+        if any(fixed.values()):
+            # Числа выводятся на страницах из кэша.
+            bump(FEEDS_NAMESPACE)
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
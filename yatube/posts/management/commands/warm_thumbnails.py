@@ -0,0 +1,137 @@
+import os
+import posixpath
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from core.cache_namespaces import bump
+from posts import thumbnails
+from posts.models import Post
+from posts.utils import FEEDS_NAMESPACE
+
+# Загрузки и миниатюры моложе этого срока не удаляются: пост с ними
+# может сохраняться прямо сейчас.
+MIN_AGE: int = 3600
+
+
+def warm(image_name: str) -> tuple:
+    """Создаёт миниатюры одной картинки в процессе пула."""
+    try:
+        return image_name, thumbnails.generate(image_name), None
+    except Exception as error:
+        return image_name, 0, str(error)
+    finally:
+        close_old_connections()
+
+
+def referenced_images() -> list:
+    """Картинки, на которые ссылаются посты."""
+    return sorted(set(Post.objects.exclude(image='').values_list(
+        'image', flat=True)))
+
+
+def walk(storage, path: str):
+    """Все файлы хранилища внутри path."""
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры всех картинок постов и удаляет миниатюры '
+            'и загрузки, на которые не ссылается ни один пост')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию - по числу ядер')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено')
+        parser.add_argument(
+            '--no-sweep', action='store_true',
+            help='Не удалять лишние файлы')
+        parser.add_argument(
+            '--min-age', type=int, default=MIN_AGE,
+            help='Не удалять файлы моложе стольких секунд')
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            self.warm(referenced_images(), options['workers'])
+        if not options['no_sweep']:
+            # Заново: пока создавались миниатюры, посты могли сохраниться
+            # с новыми картинками или с уже лежащими файлами.
+            self.sweep(referenced_images(), options['dry_run'],
+                       options['min_age'])
+
+    def warm(self, images, workers):
+        started = time.monotonic()
+        created = 0
+        # Процессы пула наследуют соединения с базой при fork.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, count, error in pool.map(warm, images, chunksize=16):
+                created += count
+                if error:
+                    self.stderr.write(f'{name}: {error}')
+        elapsed = time.monotonic() - started
+        if created:
+            bump(FEEDS_NAMESPACE)
+        self.stdout.write(
+            f'Картинок: {len(images)}, создано миниатюр: {created}, '
+            f'{elapsed:.1f} с, {len(images) / max(elapsed, 1e-6):.1f} '
+            f'картинок в секунду')
+
+    def sweep(self, images, dry_run, min_age):
+        expected = {
+            thumbnails.backend.thumbnail_file(
+                thumbnails.source(name), geometry, **variant_options).name
+            for name in images
+            for geometry, variant_options in
+            thumbnails.THUMBNAIL_VARIANTS.values()
+        }
+        thumbnail_files, thumbnail_bytes = self.remove(
+            default.storage,
+            thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/'),
+            expected, dry_run, min_age)
+        image_field = Post._meta.get_field('image')
+        upload_files, upload_bytes = self.remove(
+            image_field.storage,
+            image_field.upload_to.rstrip('/'),
+            set(images), dry_run, min_age)
+        if not dry_run:
+            # Ссылки на удалённые файлы больше не нужны.
+            default.kvstore.cleanup()
+        verb = 'Будет освобождено' if dry_run else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: миниатюр {thumbnail_files}, загрузок {upload_files}, '
+            f'{thumbnail_bytes + upload_bytes} байт'))
+
+    def remove(self, storage, path, keep, dry_run, min_age=0) -> tuple:
+        """Удаляет файлы path, которых нет в keep.
+
+        Возвращает число удалённых файлов и их размер.
+        """
+        files = size = 0
+        if not storage.exists(path):
+            return files, size
+        now = time.time()
+        for name in walk(storage, path):
+            if name in keep:
+                continue
+            if (min_age and now - storage.get_modified_time(
+                    name).timestamp() < min_age):
+                continue
+            files += 1
+            size += storage.size(name)
+            if dry_run:
+                self.stdout.write(f'Лишний файл: {name}')
+            else:
+                storage.delete(name)
+        return files, size
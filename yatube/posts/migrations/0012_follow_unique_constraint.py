@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:16
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет одну строку на пару подписчик-автор, иначе уникальный
+    индекс не создать. Счётчики подписок уменьшаются на удалённые строки."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(rows=Count('pk'), keep=Min('pk'))
+        .filter(rows__gt=1)
+    )
+    for pair in list(duplicates):
+        extra = pair['rows'] - 1
+        Follow.objects.filter(
+            user_id=pair['user_id'], author_id=pair['author_id']
+        ).exclude(pk=pair['keep']).delete()
+        UserStats.objects.filter(user_id=pair['author_id']).update(
+            followers_count=F('followers_count') - extra)
+        UserStats.objects.filter(user_id=pair['user_id']).update(
+            following_count=F('following_count') - extra)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_following'),
+        ),
+    ]
@@ -1,20 +1,49 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
-class Group(models.Model):
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для лент: автор и группа выбираются тем же запросом."""
+        return self.select_related('author', 'group')
+
+
+class CounterFieldsMixin:
+    """Сохранение уже существующего объекта не трогает счётчики: их
+    меняют только выражения F() из posts.counters, и устаревшее значение
+    из памяти не должно затирать чужие приращения."""
+    COUNTER_FIELDS: tuple = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CounterFieldsMixin, models.Model):
+    COUNTER_FIELDS: tuple = ('posts_count',)
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    posts_count = models.IntegerField('Число постов', default=0,
+                                      editable=False)
 
     def __str__(self) -> str:
         return f'Group {self.title}'
 
 
-class Post(models.Model):
+class Post(CounterFieldsMixin, models.Model):
     NUM_OF_PREVIEW_SYM: int = 15
+    COUNTER_FIELDS: tuple = ('comments_count',)
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -26,7 +55,9 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name='Автор',
-        related_name='posts'
+        related_name='posts',
+        # Столбец открывает составной индекс ленты автора.
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -35,16 +66,37 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.IntegerField('Число комментариев', default=0,
+                                         editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты читаются по (pub_date, pk) от новых к старым, с фильтром
+        # по группе или автору; сортировку даёт индекс.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -58,7 +110,8 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='Пост',
-        help_text='Пост, к которому относится комментарий'
+        help_text='Пост, к которому относится комментарий',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -74,6 +127,15 @@ class Comment(models.Model):
         'Дата публикации комментария',
         auto_now_add=True)
 
+    class Meta:
+        ordering = ['created', 'pk']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -90,6 +152,98 @@ class Follow(models.Model):
     )
 
     class Meta:
-        constraints = models.UniqueConstraint(
-            fields=['user', 'author'], name='unique_following'
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_following'
+            ),
+        ]
+        # Подписчики автора: раскладка постов по лентам и пересчёты.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя. Их ведут сигналы из posts.signals,
+    расхождения исправляет команда reconcile_counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Пользователь',
+        related_name='stats'
+    )
+    posts_count = models.IntegerField('Число постов', default=0,
+                                      editable=False)
+    followers_count = models.IntegerField('Число подписчиков', default=0,
+                                          editable=False)
+    following_count = models.IntegerField('Число подписок', default=0,
+                                          editable=False)
+
+    class Meta:
+        # Авторов с большим числом подписчиков ищет posts.feeds.
+        indexes = [
+            models.Index(
+                fields=['followers_count'], name='stats_followers_idx'
+            ),
+        ]
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class FeedEntry(models.Model):
+    """Запись во входящей ленте подписчика: пост автора, на которого
+    он подписан. Дата публикации повторяет дату поста, чтобы лента
+    читалась одним проходом по индексу."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+
+
+class SearchTerm(models.Model):
+    """Запись обратного индекса поиска: основа слова и пост, в тексте
+    которого она встречается. Используется, когда база не умеет
+    полнотекстовый поиск сама (см. posts.search)."""
+    term = models.CharField('Основа слова', max_length=100)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='search_terms'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_search_term'
+            ),
+        ]
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Слова поискового индекса'
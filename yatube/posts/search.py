@@ -0,0 +1,112 @@
+"""Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, слова сводятся к основам русским
+стеммером (core.stemmer), и основы попадают в обратный индекс. На SQLite
+индекс - это виртуальная таблица FTS5, в других базах - таблица
+``SearchTerm``. Сигналы из posts.signals обновляют индекс при сохранении
+и удалении поста в той же транзакции. Поиск находит посты, в которых
+есть все слова запроса в любой форме.
+"""
+from django.db import connection
+
+from core.stemmer import stems
+from .models import Post, SearchTerm
+
+FTS_TABLE: str = 'posts_post_fts'
+# Длиннее основы не бывают, а запрос из сотни слов - это уже не поиск.
+MAX_TERM_LENGTH: int = 100
+MAX_QUERY_TERMS: int = 10
+
+
+def terms(text: str) -> list:
+    """Основы слов текста без повторов."""
+    return list(dict.fromkeys(
+        term[:MAX_TERM_LENGTH] for term in stems(text)
+    ))
+
+
+class Fts5Index:
+    """Индекс во встроенной в SQLite таблице FTS5, rowid - id поста."""
+
+    def update(self, post: Post) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [post.pk, ' '.join(terms(post.text))]
+            )
+
+    def update_many(self, posts) -> None:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [[post.pk] for post in posts])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [[post.pk, ' '.join(terms(post.text))] for post in posts]
+            )
+
+    def delete(self, post_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def filter(self, posts, query_terms: list):
+        # Каждая основа берётся в кавычки: синтаксис FTS5 в запросе
+        # пользователя не разбирается.
+        match = ' AND '.join(
+            '"%s"' % term.replace('"', '""') for term in query_terms
+        )
+        # Подзапрос в RawSQL попал бы в IN в двойных скобках, и SQLite
+        # взял бы из него только первую строку.
+        return posts.extra(
+            where=[f'"{Post._meta.db_table}"."{Post._meta.pk.column}" IN '
+                   f'(SELECT rowid FROM {FTS_TABLE} '
+                   f'WHERE {FTS_TABLE} MATCH %s)'],
+            params=[match],
+        )
+
+
+class TermIndex:
+    """Индекс в обычной таблице: строка на каждую основу поста."""
+
+    def update(self, post: Post) -> None:
+        SearchTerm.objects.filter(post=post).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post=post) for term in terms(post.text)
+        )
+
+    def update_many(self, posts) -> None:
+        SearchTerm.objects.filter(post__in=posts).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post=post)
+            for post in posts for term in terms(post.text)
+        )
+
+    def delete(self, post_id: int) -> None:
+        # Строки индекса удаляются вместе с постом.
+        pass
+
+    def filter(self, posts, query_terms: list):
+        first, *rest = query_terms
+        post_ids = SearchTerm.objects.filter(term=first)
+        for term in rest:
+            post_ids = post_ids.filter(
+                post_id__in=SearchTerm.objects.filter(
+                    term=term).values('post_id')
+            )
+        return posts.filter(pk__in=post_ids.values('post_id'))
+
+
+def get_index():
+    if connection.vendor == 'sqlite':
+        return Fts5Index()
+    return TermIndex()
+
+
+def search(posts, query: str):
+    """Посты из posts, в которых есть все слова запроса."""
+    query_terms = terms(query)[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return posts.none()
+    return get_index().filter(posts, query_terms)
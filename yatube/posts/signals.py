@@ -0,0 +1,158 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache_namespaces import bump_on_commit
+from . import counters, feeds, search, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import (FEEDS_NAMESPACE, group_page, post_page, profile_page,
+                    post_write_namespaces)
+
+# Вход пользователя обновляет только last_login: на ленты это не влияет.
+USER_SERVICE_FIELDS = frozenset({'last_login'})
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку поста: ленту прежней группы
+    тоже нужно сбросить, а для новой картинки - создать миниатюры."""
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if previous is not None:
+            (instance._previous_group_id,
+             instance._previous_image) = previous
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created:
+        updates = [(counters.user_stats(instance.author_id),
+                    'posts_count', 1)]
+    elif previous_group_id != instance.group_id:
+        updates = [(Group.objects.filter(pk=previous_group_id),
+                    'posts_count', -1)]
+    else:
+        return
+    updates.append((Group.objects.filter(pk=instance.group_id),
+                    'posts_count', 1))
+    counters.change(*updates)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change(
+        (counters.user_stats(instance.author_id), 'posts_count', -1),
+        (Group.objects.filter(pk=instance.group_id), 'posts_count', -1),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change(
+            (Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change(
+        (Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+    )
+
+
+# Счётчики подписок обновляются раньше лент: по числу подписчиков
+# feeds решает, раскладывать ли посты автора.
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change(
+            (counters.user_stats(instance.author_id), 'followers_count', 1),
+            (counters.user_stats(instance.user_id), 'following_count', 1),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change(
+        (counters.user_stats(instance.author_id), 'followers_count', -1),
+        (counters.user_stats(instance.user_id), 'following_count', -1),
+    )
+
+
+@receiver(post_save, sender=Post)
+def make_thumbnails(sender, instance, **kwargs):
+    if instance.image.name != getattr(instance, '_previous_image', None):
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_index().update(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_index().delete(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        feeds.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feeds.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feeds.prune(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    bump_on_commit(*post_write_namespaces(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_page(sender, instance, **kwargs):
+    bump_on_commit(post_page(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    # В профилях выводятся числа подписчиков и подписок.
+    bump_on_commit(profile_page(instance.author_id),
+                   profile_page(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    # Название и адрес группы выводятся и в других лентах.
+    bump_on_commit(group_page(instance.pk), FEEDS_NAMESPACE)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_pages(sender, instance, update_fields=None, **kwargs):
+    if update_fields and USER_SERVICE_FIELDS.issuperset(update_fields):
+        return
+    # Имя автора выводится в каждой ленте.
+    bump_on_commit(profile_page(instance.pk), FEEDS_NAMESPACE)
@@ -0,0 +1,33 @@
+from django import template
+
+from posts import thumbnails
+from posts.forms import CommentForm
+from posts.models import Follow
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author_id):
+    """Подписан ли текущий пользователь на автора."""
+    user = context.get('user')
+    if user is None or not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author_id=author_id).exists()
+
+
+@register.simple_tag
+def comment_form():
+    return CommentForm()
+
+
+@register.inclusion_tag('posts/includes/responsive_image.html')
+def responsive_image(image, name='card', sizes='100vw'):
+    """Картинка с заранее созданными миниатюрами всех ширин."""
+    return {
+        'src': thumbnails.cached_url(image, name),
+        'srcset': thumbnails.srcset(image, name),
+        'webp_srcset': (thumbnails.srcset(image, name, webp=True)
+                        if thumbnails.WEBP_ENABLED else ''),
+        'sizes': sizes,
+    }
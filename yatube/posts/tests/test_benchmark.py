@@ -0,0 +1,72 @@
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import benchmark, counters
+from ..models import Post, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+DATASET: dict = {'users': 20, 'groups': 3, 'posts': 60, 'comments': 40,
+                 'follows': 60}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dataset = benchmark.seed(random.Random(1), **DATASET)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed(self):
+        '''Синтетические данные согласованы, популярность неравная'''
+        self.assertEqual(self.dataset['posts'], DATASET['posts'])
+        self.assertEqual(self.dataset['comments'], DATASET['comments'])
+        self.assertLessEqual(self.dataset['follows'], DATASET['follows'])
+        self.assertFalse(any(counters.reconcile().values()))
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        posts = list(UserStats.objects.order_by(
+            '-posts_count').values_list('posts_count', flat=True))
+        self.assertGreater(posts[0], 3 * posts[len(posts) // 2])
+
+    def test_run(self):
+        '''Каждый сценарий даёт задержки, запросы и пропускную
+        способность'''
+        views = benchmark.run(random.Random(1), requests=5, warmup=1)
+        self.assertEqual(tuple(views), benchmark.SCENARIOS)
+        for name, result in views.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['requests'], 5)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+                self.assertGreater(result['max_queries'], 0)
+                self.assertGreater(result['rps'], 0)
+
+
+class RegressionsTests(SimpleTestCase):
+    def test_percentile(self):
+        '''Процентиль по ближайшему рангу'''
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_regressions(self):
+        '''Регрессия - рост p95 сверх порога или числа запросов'''
+        baseline = {'views': {
+            'index': {'p95_ms': 10.0, 'max_queries': 3},
+            'profile': {'p95_ms': 10.0, 'max_queries': 3},
+        }}
+        current = {'views': {
+            'index': {'p95_ms': 11.0, 'max_queries': 3},
+            'profile': {'p95_ms': 13.0, 'max_queries': 4},
+            'post_detail': {'p95_ms': 50.0, 'max_queries': 9},
+        }}
+        found = benchmark.regressions(current, baseline, threshold=0.2)
+        self.assertEqual(len(found), 2)
+        self.assertTrue(all(line.startswith('profile') for line in found))
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_namespaces import bump, get_version
+from core.caches import TieredCache, cache_settings
+
+TEMP_CACHE_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(CACHES=cache_settings(
+    '/unused', environ={'CACHE_BACKEND': 'file',
+                        'CACHE_LOCATION': TEMP_CACHE_ROOT},
+    l1_bypass=('mutable:',)))
+class TieredCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def other_process(self):
+        '''L1 другого процесса: в тесте - просто пустой'''
+        caches['local'].clear()
+
+    def test_default_cache_is_tiered(self):
+        '''Кэш по умолчанию - L1 в памяти перед общим L2'''
+        self.assertIsInstance(caches['default'], TieredCache)
+
+    def test_read_through_fills_l1(self):
+        '''Значение из L2 копируется в L1'''
+        caches['shared'].set('key', 'value')
+        self.assertIsNone(caches['local'].get('key'))
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(caches['local'].get('key'), 'value')
+
+    def test_hot_key_is_read_from_l1(self):
+        '''Частый ключ читается из L1 без обращения к L2'''
+        cache.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get_many(['key']), {'key': 'value'})
+
+    def test_writes_are_shared(self):
+        '''Запись одного процесса видна другому'''
+        cache.set_many({'first': 1, 'second': 2})
+        self.other_process()
+        self.assertEqual(cache.get_many(['first', 'second', 'third']),
+                         {'first': 1, 'second': 2})
+        cache.delete('first')
+        self.assertIsNone(caches['shared'].get('first'))
+
+    def test_namespace_versions_skip_l1(self):
+        '''Версии пространств ключей не оседают в L1'''
+        version = get_version('tiered')
+        self.assertEqual(caches['local'].get_many(
+            ['namespace_version:tiered']), {})
+        # Другой процесс сдвигает версию только в L2.
+        caches['shared'].incr('namespace_version:tiered')
+        self.assertEqual(get_version('tiered'), version + 1)
+        bump('tiered')
+        self.assertGreater(get_version('tiered'), version + 1)
+
+    def test_bypass_keys_skip_l1(self):
+        '''Изменяемые на месте ключи читаются только из L2'''
+        cache.set('mutable:key', 1)
+        caches['shared'].set('mutable:key', 2)
+        self.assertEqual(cache.get('mutable:key'), 2)
+        self.assertFalse(caches['local'].has_key('mutable:key'))
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_locmem_by_default(self):
+        '''Без переменных окружения кэш у каждого процесса свой'''
+        self.assertEqual(
+            cache_settings('/srv/yatube', environ={}),
+            {'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+    def test_shared_backends(self):
+        '''Общий кэш стоит за L1 в памяти процесса'''
+        file_caches = cache_settings('/srv/yatube', environ={
+            'CACHE_BACKEND': 'file'})
+        self.assertEqual(file_caches['default']['BACKEND'],
+                         'core.caches.TieredCache')
+        self.assertEqual(file_caches['shared']['LOCATION'],
+                         '/srv/yatube/cache')
+        memcached = cache_settings('/srv/yatube', environ={
+            'CACHE_BACKEND': 'memcached', 'CACHE_LOCATION': 'cache:11211'})
+        self.assertEqual(memcached['shared']['LOCATION'], 'cache:11211')
+
+    def test_unknown_backend(self):
+        '''Неизвестный бэкенд - ошибка настройки'''
+        with self.assertRaises(ImproperlyConfigured):
+            cache_settings('/srv/yatube', environ={'CACHE_BACKEND': 'redis'})
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import thumbnails
+from ..management.commands import warm_thumbnails
+from ..models import Post
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SerialExecutor:
+    """Пул без процессов: тестовая база видна только этому процессу."""
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def map(self, fn, *iterables, chunksize=1):
+        return map(fn, *iterables)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+@mock.patch.object(warm_thumbnails, 'ProcessPoolExecutor', SerialExecutor)
+class WarmThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='warm-author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch.object(thumbnails, 'schedule'):
+            self.post = Post.objects.create(
+                text='Пост с картинкой', author=WarmThumbnailsTests.author,
+                image=ContentFile(SMALL_GIF, name='small.gif'))
+        self.orphan_upload = default_storage.save('posts/orphan.gif',
+                                                  ContentFile(SMALL_GIF))
+        self.orphan_thumbnail = default_storage.save('cache/00/00/old.jpg',
+                                                     ContentFile(b'old'))
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_warm_generates_thumbnails_and_sweeps_orphans(self):
+        '''Команда создаёт миниатюры и удаляет лишние файлы'''
+        out = StringIO()
+        call_command('warm_thumbnails', min_age=0, stdout=out)
+        url = thumbnails.cached_url(self.post.image, 'card')
+        self.assertNotEqual(url, self.post.image.url)
+        self.assertTrue(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, url[len(settings.MEDIA_URL):])))
+        self.assertTrue(default_storage.exists(self.post.image.name))
+        self.assertFalse(default_storage.exists(self.orphan_upload))
+        self.assertFalse(default_storage.exists(self.orphan_thumbnail))
+        self.assertIn(
+            f'создано миниатюр: {len(thumbnails.THUMBNAIL_VARIANTS)}',
+            out.getvalue())
+        self.assertIn(f'миниатюр 1, загрузок 1, {len(SMALL_GIF) + 3} байт',
+                      out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        '''С --dry-run команда только перечисляет лишние файлы'''
+        out = StringIO()
+        call_command('warm_thumbnails', min_age=0, dry_run=True, stdout=out)
+        self.assertTrue(default_storage.exists(self.orphan_upload))
+        self.assertTrue(default_storage.exists(self.orphan_thumbnail))
+        self.assertIn(self.orphan_upload, out.getvalue())
+
+    def test_recent_files_are_kept(self):
+        '''Недавние загрузки и миниатюры не удаляются'''
+        call_command('warm_thumbnails', stdout=StringIO())
+        self.assertTrue(default_storage.exists(self.orphan_upload))
+        self.assertTrue(default_storage.exists(self.orphan_thumbnail))
+
+    def test_posts_saved_while_warming_are_kept(self):
+        '''Картинки постов, сохранённых во время работы, не удаляются'''
+        def save_post(command, images, workers):
+            # Новый пост берёт файл, на который до этого никто не ссылался.
+            with mock.patch.object(thumbnails, 'schedule'):
+                Post.objects.create(
+                    text='Новый пост', author=WarmThumbnailsTests.author,
+                    image=ContentFile(SMALL_GIF, name='new.gif'))
+
+        Post.objects.filter(pk=self.post.pk).update(image='')
+        with mock.patch.object(warm_thumbnails.Command, 'warm', save_post):
+            call_command('warm_thumbnails', min_age=0, stdout=StringIO())
+        self.assertTrue(default_storage.exists(self.post.image.name))
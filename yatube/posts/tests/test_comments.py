@@ -0,0 +1,199 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import comments
+from ..models import Comment, Post
+from ..utils import CURSOR_PARAM
+from ..views import COMMENTS_ON_PAGE
+
+User = get_user_model()
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comments-author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text=f'Комментарий {number}')
+            for number in range(COMMENTS_ON_PAGE * 2 + 5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.pk})
+        self.fragment_url = reverse('posts:post_comments',
+                                    kwargs={'post_id': self.post.pk})
+
+    def test_post_detail_shows_first_page(self):
+        '''Страница поста выводит первые комментарии по порядку'''
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:COMMENTS_ON_PAGE])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, f'{CURSOR_PARAM}={comments.next_cursor}')
+
+    def test_fragments_load_all_comments(self):
+        '''Фрагменты по курсору догружают все комментарии по порядку'''
+        comments = self.client.get(self.detail_url).context['comments']
+        seen = list(comments)
+        while comments.has_next():
+            response = self.client.get(
+                self.fragment_url, {CURSOR_PARAM: comments.next_cursor})
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            seen += list(comments)
+        self.assertEqual(seen, self.comments)
+
+    def test_json_fragment(self):
+        '''Страница комментариев отдаётся и в JSON'''
+        data = self.client.get(self.fragment_url, {'format': 'json'}).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [comment.pk for comment in self.comments[:COMMENTS_ON_PAGE]])
+        self.assertEqual(data['comments'][0]['author'],
+                         self.author.username)
+        data = self.client.get(self.fragment_url, {
+            'format': 'json', CURSOR_PARAM: data['next_cursor']}).json()
+        self.assertEqual(data['comments'][0]['id'],
+                         self.comments[COMMENTS_ON_PAGE].pk)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_json_keeps_hole_markers_as_text(self):
+        '''Метка фрагмента в тексте комментария отдаётся в JSON как есть'''
+        marker = '<!--hole:%s-->' % base64.urlsafe_b64encode(json.dumps(
+            ['no/such/template.html', {}]).encode()).decode()
+        post = Post.objects.create(text='Пост с меткой', author=self.author)
+        Comment.objects.create(post=post, author=self.author, text=marker)
+        url = reverse('posts:post_comments', kwargs={'post_id': post.pk})
+        for _ in range(2):
+            response = self.client.get(url, {'format': 'json'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['comments'][0]['text'], marker)
+
+    def test_fragment_of_missing_post(self):
+        '''У несуществующего поста нет комментариев'''
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='batch-author')
+        cls.bot = User.objects.create_user(username='batch-bot')
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author)
+                     for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.bot)
+        self.url = reverse('posts:add_comments')
+
+    def send(self, payloads):
+        return self.client.post(self.url, json.dumps({'comments': payloads}),
+                                content_type='application/json')
+
+    def test_batch_is_saved_with_counters(self):
+        '''Пакет сохраняется целиком, счётчики растут на число
+        комментариев поста'''
+        payloads = [{'post': post.pk, 'text': f'Комментарий {number}'}
+                    for number, post in enumerate(self.posts * 2)]
+        response = self.send(payloads)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': len(payloads)})
+        for post in self.posts:
+            post.refresh_from_db()
+            self.assertEqual(post.comments_count, 2)
+            self.assertEqual(
+                set(post.comments.values_list('author', flat=True)),
+                {self.bot.pk})
+
+    def test_queries_do_not_grow_with_batch(self):
+        '''Число запросов не зависит от числа комментариев'''
+        queries = []
+        for size in (1, 50):
+            with CaptureQueriesContext(connection) as context:
+                comments.add_many(self.bot, [
+                    {'post': post.pk, 'text': f'Комментарий {number}'}
+                    for number in range(size) for post in self.posts[:2]
+                ])
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(Comment.objects.count(), 102)
+
+    def test_invalid_batch_saves_nothing(self):
+        '''Одна плохая запись отклоняет весь пакет'''
+        cases = {
+            'пустой текст': ({'post': self.posts[0].pk, 'text': ''}, 'text'),
+            'нет поста': ({'post': 0, 'text': 'Текст'}, 'post'),
+            'чужой пост': ({'post': 10 ** 9, 'text': 'Текст'}, 'post'),
+            'не словарь': ('Текст', 'text'),
+        }
+        for name, (payload, field) in cases.items():
+            with self.subTest(name=name):
+                response = self.send([
+                    {'post': self.posts[1].pk, 'text': 'Хороший'}, payload])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json()['errors']['1'])
+                self.assertFalse(Comment.objects.exists())
+
+    def test_bad_requests(self):
+        '''Без списка comments или со слишком большим пакетом - 400,
+        без входа - 401 в JSON'''
+        bodies = (
+            'не JSON',
+            json.dumps([]),
+            json.dumps({'comments': {}}),
+            json.dumps({'comments': [{}] * (comments.MAX_BATCH + 1)}),
+        )
+        for body in bodies:
+            with self.subTest(body=body[:20]):
+                response = self.client.post(
+                    self.url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        response = Client().post(self.url, json.dumps({'comments': []}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.json())
+
+    def test_csrf_token_is_required(self):
+        '''Без заголовка X-CSRFToken пакет отклоняется'''
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.bot)
+        body = json.dumps({'comments': [
+            {'post': self.posts[0].pk, 'text': 'Комментарий'}]})
+        response = client.post(self.url, body,
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Comment.objects.exists())
+        token = client.get(
+            reverse('posts:post_create')).cookies['csrftoken'].value
+        response = client.post(self.url, body,
+                               content_type='application/json',
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+
+    def test_missing_post_comment_is_404(self):
+        '''Комментарий к несуществующему посту - 404'''
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': 0}),
+            {'text': 'Текст'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,62 @@
+import pickle
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..compact import dump_posts, load_posts
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class CompactPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='compact-author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='compact-group')
+        Post.objects.create(text='Пост без группы', author=cls.author)
+        Post.objects.create(text='Пост в группе', author=cls.author,
+                            group=cls.group, image='posts/image.gif')
+
+    def test_round_trip(self):
+        '''Посты из кэша выводятся в лентах без запросов к базе'''
+        posts = list(Post.objects.feed())
+        payload = pickle.dumps(dump_posts(posts))
+        with self.assertNumQueries(0):
+            loaded = load_posts(pickle.loads(payload))
+            for post, original in zip(loaded, posts):
+                with self.subTest(post=original.text):
+                    self.assertEqual(post, original)
+                    self.assertEqual(post.text, original.text)
+                    self.assertEqual(post.pub_date, original.pub_date)
+                    self.assertEqual(post.image, original.image)
+                    self.assertEqual(post.author, original.author)
+                    self.assertEqual(post.author.get_full_name(),
+                                     'Имя Фамилия')
+                    self.assertEqual(post.group, original.group)
+            self.assertEqual(loaded[0].group.slug, self.group.slug)
+            self.assertIsNone(loaded[1].group)
+
+    def test_payload_is_smaller(self):
+        '''Компактная запись меньше pickle моделей'''
+        posts = list(Post.objects.feed())
+        self.assertLess(len(pickle.dumps(dump_posts(posts))),
+                        len(pickle.dumps(posts)))
+
+    def test_other_fields_are_deferred(self):
+        '''Поля, которых нет в записи, загружаются по обращению'''
+        post = load_posts(dump_posts(Post.objects.feed()))[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(post.group.description, 'Описание')
+
+    def test_benchmark_command(self):
+        '''Команда сравнивает обе записи страницы'''
+        out = StringIO()
+        call_command('benchmark_feed_payload', repeat=1, stdout=out)
+        self.assertIn('pickle моделей', out.getvalue())
+        self.assertIn('компактные кортежи', out.getvalue())
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Group, Post
+from .test_page_cache import committed
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='etag-group')
+        cls.author = User.objects.create_user(username='etag-author')
+        cls.reader = User.objects.create_user(username='etag-reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts',
+                    kwargs={'slug': ConditionalGetTests.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': ConditionalGetTests.author.username}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': ConditionalGetTests.post.pk}),
+        )
+
+    def test_matching_etag_is_answered_before_rendering(self):
+        '''Совпавший ETag получает 304 без рендера и без запросов
+        постов'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertTrue(first.has_header('Last-Modified'))
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second.templates, [])
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_modified_since(self):
+        '''Страница без записей с Last-Modified получает 304'''
+        url = self.urls[0]
+        first = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_changes_etag(self):
+        '''Запись, которая касается страницы, меняет её ETag'''
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        with committed():
+            Post.objects.create(text='Новый пост', author=self.author,
+                                group=self.group)
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+        with committed():
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text='Комментарий')
+        response = self.guest_client.get(
+            self.urls[3], HTTP_IF_NONE_MATCH=etags[self.urls[3]])
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_visitor(self):
+        '''Гость и пользователь получают разные ETag'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                guest_etag = self.guest_client.get(url)['ETag']
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=guest_etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], guest_etag)
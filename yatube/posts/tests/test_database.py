@@ -0,0 +1,61 @@
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.database import (DEFAULT_CONN_MAX_AGE, SQLITE_ENGINE,
+                           SQLITE_TIMEOUT, database_settings)
+
+POSTGRES_ENGINE = 'django.db.backends.postgresql'
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        '''Без переменных окружения используется файл SQLite'''
+        database = database_settings('/srv/yatube', environ={})
+        self.assertEqual(database['ENGINE'], SQLITE_ENGINE)
+        self.assertEqual(database['NAME'], '/srv/yatube/db.sqlite3')
+        self.assertEqual(database['CONN_MAX_AGE'], DEFAULT_CONN_MAX_AGE)
+        self.assertEqual(database['OPTIONS'], {'timeout': SQLITE_TIMEOUT})
+
+    def test_server_database_from_environment(self):
+        '''Сервер базы и пулер задаются переменными окружения'''
+        database = database_settings('/srv/yatube', environ={
+            'DB_ENGINE': POSTGRES_ENGINE,
+            'DB_NAME': 'yatube',
+            'DB_USER': 'yatube',
+            'DB_PASSWORD': 'secret',
+            'DB_HOST': 'pgbouncer',
+            'DB_PORT': '6432',
+            'DB_CONN_MAX_AGE': 'none',
+            'DB_POOL': 'pgbouncer',
+        })
+        self.assertEqual(database['ENGINE'], POSTGRES_ENGINE)
+        self.assertEqual(database['HOST'], 'pgbouncer')
+        self.assertEqual(database['PORT'], '6432')
+        self.assertIsNone(database['CONN_MAX_AGE'])
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_unknown_pool(self):
+        '''Неизвестный пулер - ошибка настройки'''
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings('/srv/yatube', environ={
+                'DB_ENGINE': POSTGRES_ENGINE, 'DB_POOL': 'pgpool'})
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'Прагмы задаются только для SQLite')
+class SqlitePragmasTests(SimpleTestCase):
+    databases = {'default'}
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        '''Новое соединение ждёт блокировку и не синхронизирует каждую
+        запись'''
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), SQLITE_TIMEOUT * 1000)
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feeds
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed-author')
+        cls.reader = User.objects.create_user(username='feed-reader')
+        cls.other_reader = User.objects.create_user(username='feed-reader-2')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FollowFeedTests.reader)
+
+    def feed_pks(self, user):
+        return [post.pk for post in feeds.follow_feed(user)]
+
+    def test_follow_backfills_and_unfollow_prunes_inbox(self):
+        '''Подписка добавляет посты автора в ленту, отписка убирает'''
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        '''Новый пост попадает во входящие ленты всех подписчиков'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            FeedEntry.objects.filter(post=post).count(), 2)
+        self.assertEqual(self.feed_pks(self.reader),
+                         [post.pk, self.old_post.pk])
+
+    def test_feed_is_read_from_inbox_only(self):
+        '''Лента подписок читается из входящей ленты без обхода подписок'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 1)
+        feed_queries = [query['sql'] for query in queries.captured_queries
+                        if 'FROM "posts_post"' in query['sql']]
+        self.assertTrue(feed_queries)
+        for sql in feed_queries:
+            self.assertIn('"posts_feedentry"', sql)
+            self.assertNotIn('"posts_follow"', sql)
+
+    def test_feed_keyset_pages(self):
+        '''По ленте подписок можно листать курсорами'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(12):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        first = self.client.get(
+            reverse('posts:follow_index')).context['page_obj']
+        second = self.client.get(
+            reverse('posts:follow_index'),
+            {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in first] + [post.pk for post in second],
+            self.feed_pks(self.reader))
+
+    @mock.patch.object(feeds, 'FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_popular_author_is_read_on_request(self):
+        '''Посты популярного автора подмешиваются при чтении ленты'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        post = Post.objects.create(text='Пост для многих', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        for user in (self.reader, self.other_reader):
+            with self.subTest(user=user):
+                self.assertEqual(self.feed_pks(user),
+                                 [post.pk, self.old_post.pk])
+
+    @mock.patch.object(feeds, 'FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_author_losing_followers_is_fanned_out_again(self):
+        '''Когда автор перестаёт быть популярным, его посты
+            раскладываются по лентам оставшихся подписчиков'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        post = Post.objects.create(text='Пост для многих', author=self.author)
+        Follow.objects.get(user=self.other_reader).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_pks(self.reader),
+                         [post.pk, self.old_post.pk])
+        self.assertEqual(self.feed_pks(self.other_reader), [])
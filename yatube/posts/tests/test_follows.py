@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follows
+from ..models import FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='follows-author')
+        cls.other_author = User.objects.create_user(
+            username='follows-other-author')
+        cls.reader = User.objects.create_user(username='follows-reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_unique_constraint(self):
+        '''Вторую строку той же подписки отклоняет база'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_follow_is_idempotent(self):
+        '''Повторная подписка ничего не меняет'''
+        self.assertTrue(follows.follow(self.reader, self.author))
+        self.assertFalse(follows.follow(self.reader, self.author))
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+    def test_cannot_follow_self(self):
+        '''На себя подписаться нельзя'''
+        self.assertFalse(follows.follow(self.reader, self.reader))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_is_idempotent(self):
+        '''Повторная отписка ничего не меняет'''
+        follows.follow(self.reader, self.author)
+        self.assertTrue(follows.unfollow(self.reader, self.author))
+        self.assertFalse(follows.unfollow(self.reader, self.author))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_views_do_not_check_before_write(self):
+        '''Подписка и отписка не проверяют подписку отдельным запросом'''
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:profile_follow',
+                      kwargs={'username': self.author.username})
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            self.assertFalse(
+                [query for query in queries.captured_queries
+                 if query['sql'].startswith('SELECT')
+                 and '"posts_follow"' in query['sql']],
+                'Подписка читает таблицу подписок перед вставкой')
+        self.assertEqual(Follow.objects.count(), 1)
+        client.get(reverse('posts:profile_unfollow',
+                           kwargs={'username': self.author.username}))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_many(self):
+        '''Подписки создаются пачкой с счётчиками и лентами'''
+        follows.follow(self.reader, self.author)
+        created = follows.follow_many([
+            (self.reader.pk, self.author.pk),
+            (self.reader.pk, self.other_author.pk),
+            (self.author.pk, self.other_author.pk),
+            (self.author.pk, self.other_author.pk),
+            (self.author.pk, self.author.pk),
+        ])
+        self.assertEqual(created, 2)
+        self.assertEqual(Follow.objects.count(), 3)
+        self.assertEqual(self.stats(self.other_author).followers_count, 2)
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+        self.assertEqual(self.stats(self.author).following_count, 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader,
+                                     post=self.post).exists())
+        self.assertEqual(follows.follow_many([]), 0)
+
+    def test_follow_many_queries_do_not_grow(self):
+        '''Пачка подписок заполняет ленты за постоянное число запросов'''
+        readers = [User.objects.create_user(username=f'follows-many-{number}')
+                   for number in range(6)]
+        Post.objects.create(text='Второй пост', author=self.other_author)
+        for size in (2, 6):
+            Follow.objects.all().delete()
+            FeedEntry.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                follows.follow_many(
+                    (reader.pk, author.pk) for reader in readers[:size]
+                    for author in (self.author, self.other_author))
+            self.assertEqual(FeedEntry.objects.count(), size * 2)
+            # Счётчик обновляется отдельно для каждого пользователя.
+            feed_queries = [query for query in queries.captured_queries
+                            if '"posts_userstats" SET' not in query['sql']]
+            if size == 2:
+                expected = len(feed_queries)
+        self.assertEqual(len(feed_queries), expected)
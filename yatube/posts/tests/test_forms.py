@@ -12,7 +12,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -81,13 +81,13 @@ class PostFormTests(TestCase):
                                  kwargs={'username': PostFormTests.author1}
                              ))
         self.assertEqual(Post.objects.count(), posts_count + 1)
-        self.assertTrue(
-            Post.objects.filter(
-                text='Текст нового тестового поста',
-                group=PostFormTests.group1,
-                image='posts/small.gif'
-            ).exists()
-        )
+        post = Post.objects.filter(
+            text='Текст нового тестового поста',
+            group=PostFormTests.group1,
+        ).first()
+        self.assertIsNotNone(post)
+        # Картинка сохраняется перекодированной в PNG под хэшем содержимого.
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{64}\.png$')
 
     def test_edit_post_for_authorized_client(self):
         '''Авторизованный пользователь может редактировать пост'''
@@ -0,0 +1,123 @@
+import re
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..utils import CURSOR_PARAM
+from ..views import COMMENTS_ON_PAGE, POSTS_ON_PAGE
+
+User = get_user_model()
+
+# Строки плана SQLite, которые означают чтение таблицы целиком или
+# сортировку во временном дереве. Проход по индексу (SCAN ... USING
+# INDEX) читает строки уже в нужном порядке и останавливается на LIMIT.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'Планы запросов разбираются в формате SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='plan-reader')
+        cls.author = User.objects.create_user(username='plan-author')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='plan-group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(POSTS_ON_PAGE * 2):
+            Post.objects.create(text=f'Пост про индексы {number}',
+                                author=cls.author, group=cls.group)
+        cls.post = Post.objects.first()
+        for number in range(POSTS_ON_PAGE):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self):
+        self.tables = connection.introspection.table_names()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTests.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts',
+                kwargs={'slug': QueryPlanTests.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile',
+                kwargs={'username': QueryPlanTests.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': QueryPlanTests.post.pk}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_queries_use_indexes(self, url, sorts=False):
+        # Статистики (ANALYZE) в тестовой базе нет, и планировщик считает
+        # таблицы большими, как в рабочей базе.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.plan(query['sql']):
+                scan = FULL_SCAN.match(step)
+                # Подзапрос уже собран из строк, найденных по индексу.
+                self.assertFalse(scan and scan.group(1) in self.tables,
+                                 f'{step}: {query["sql"]}')
+                if not sorts:
+                    self.assertNotIn(TEMP_SORT, step, query['sql'])
+        return response
+
+    def test_pages_do_not_scan_or_sort(self):
+        '''Запросы страниц не читают таблицы целиком и не сортируют'''
+        for name, url in self.urls().items():
+            with self.subTest(page=name):
+                response = self.assert_queries_use_indexes(url)
+                page_obj = response.context.get('page_obj')
+                if page_obj is None or not page_obj.has_next():
+                    continue
+                separator = '&' if '?' in url else '?'
+                self.assert_queries_use_indexes(
+                    f'{url}{separator}{CURSOR_PARAM}='
+                    f'{page_obj.next_cursor}')
+
+    def test_numbered_page_uses_index(self):
+        '''Номерная страница ленты тоже читается по индексу'''
+        self.assert_queries_use_indexes(reverse('posts:index') + '?page=2')
+
+    def test_search_does_not_scan(self):
+        '''Поиск находит посты по индексу, а не перебором'''
+        # Найденные посты сортируются по дате: их порядок не совпадает
+        # с порядком обратного индекса.
+        self.assert_queries_use_indexes(
+            reverse('posts:search') + '?q=индекс', sorts=True)
+
+    def test_comment_pages_use_index(self):
+        '''Следующие страницы комментариев читаются по индексу'''
+        post = QueryPlanTests.post
+        for number in range(COMMENTS_ON_PAGE * 2):
+            Comment.objects.create(post=post, author=QueryPlanTests.reader,
+                                   text=f'Ещё комментарий {number}')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        cursor = response.context['comments'].next_cursor
+        self.assert_queries_use_indexes(
+            reverse('posts:post_comments', kwargs={'post_id': post.pk})
+            + f'?{CURSOR_PARAM}={cursor}')
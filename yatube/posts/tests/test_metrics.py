@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import metrics
+from ..models import Post
+
+User = get_user_model()
+SERVER_TIMING_RE = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", tpl;dur=([\d.]+)')
+
+
+@override_settings(METRICS_TOKEN='metrics-token')
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='metrics-author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.clear()
+        self.client = Client()
+
+    def test_server_timing(self):
+        '''Server-Timing сообщает число запросов к базе и время
+        отрисовки шаблонов'''
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        match = SERVER_TIMING_RE.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match[1]), len(queries))
+        self.assertGreater(float(match[2]), 0)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_paginator_cache_hits_and_misses(self):
+        '''Промахи и попадания кэша страниц ленты'''
+        first = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc="0 hits, 2 misses"', first['Server-Timing'])
+        second = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc="2 hits, 0 misses"',
+                      second['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        '''Гистограммы по имени view отдаются в формате Prometheus'''
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get('/unexisting_page/')
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="posts:index"} 2', text)
+        self.assertIn('yatube_db_queries_bucket'
+                      '{view="posts:index",le="+Inf"} 2', text)
+        self.assertIn('yatube_template_render_seconds_sum'
+                      '{view="posts:index"}', text)
+        self.assertIn('yatube_paginator_cache_misses_total'
+                      '{view="posts:index"} 2', text)
+        self.assertIn(f'{{view="{metrics.UNRESOLVED_VIEW}"}}', text)
+
+    def test_metrics_endpoint_needs_token(self):
+        '''Без токена метрик не видно, даже через локальный прокси'''
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+                        {'HTTP_AUTHORIZATION': 'metrics-token'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+                    HTTP_X_FORWARDED_FOR='203.0.113.5', **headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertNotIn(b'yatube_', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_endpoint_is_off_without_token(self):
+        '''Если токен не задан, адреса метрик нет'''
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def test_histogram_buckets_are_cumulative(self):
+        '''Корзина гистограммы считает все значения не больше границы'''
+        histogram = metrics.REGISTRY.histograms['queries']
+        for value in (0, 2, 2, 100):
+            histogram.observe('view', value)
+        text = metrics.REGISTRY.render()
+        for bound, count in (('0', 1), ('1', 1), ('2', 3), ('89', 3),
+                             ('+Inf', 4)):
+            with self.subTest(bound=bound):
+                self.assertIn('yatube_db_queries_bucket'
+                              f'{{view="view",le="{bound}"}} {count}', text)
+        self.assertIn('yatube_db_queries_sum{view="view"} 104', text)
+
+    def test_work_outside_request(self):
+        '''Работа вне запроса записывается под отдельной меткой'''
+        with metrics.timed('thumbnails'):
+            pass
+        self.assertIn(
+            'yatube_thumbnail_seconds_count'
+            f'{{view="{metrics.BACKGROUND_VIEW}"}} 1',
+            metrics.REGISTRY.render())
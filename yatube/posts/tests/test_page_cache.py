@@ -0,0 +1,222 @@
+import base64
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import stampede
+from core.cached_paginator import CachedPaginator
+from core.page_cache import build_page_key, fill_holes, make_hole
+from ..models import Comment, Follow, Group, Post
+from ..utils import FEEDS_NAMESPACE, INDEX_PAGE
+from ..views import POSTS_ON_PAGE
+
+User = get_user_model()
+
+
+@contextmanager
+def committed(using=DEFAULT_DB_ALIAS):
+    '''Выполняет колбэки on_commit, записанные в блоке: TestCase
+    не фиксирует транзакций, и кэш без этого не сбрасывается'''
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, func in callbacks:
+        func()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа для кэша',
+            description='Описание',
+            slug='cache-group',
+        )
+        cls.author = User.objects.create_user(username='cache-author')
+        cls.reader = User.objects.create_user(username='cache-reader')
+        cls.post = Post.objects.create(
+            text='Пост для кэша страниц',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(PageCacheTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PageCacheTests.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts',
+                    kwargs={'slug': PageCacheTests.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': PageCacheTests.author.username}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': PageCacheTests.post.pk}),
+        )
+
+    def test_anonymous_page_is_served_without_rendering(self):
+        '''Повторная страница для гостя не рендерится и не ходит в базу'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.templates, [])
+                self.assertEqual(second.content, first.content)
+
+    def test_user_fragments_are_filled_into_shared_skeleton(self):
+        '''Меню, ссылка на редактирование и подписка заполняются
+            для каждого пользователя в общий скелет страницы'''
+        edit_url = reverse('posts:post_edit',
+                           kwargs={'post_id': PageCacheTests.post.pk})
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                author_page = self.author_client.get(url)
+                reader_page = self.reader_client.get(url)
+                guest_page = self.guest_client.get(url)
+                self.assertContains(author_page, edit_url)
+                self.assertContains(author_page, 'cache-author')
+                self.assertNotContains(reader_page, edit_url)
+                self.assertContains(reader_page, 'cache-reader')
+                self.assertNotContains(guest_page, edit_url)
+                self.assertNotContains(guest_page, 'Выйти')
+                self.assertContains(guest_page, 'Войти')
+
+    def test_follow_button_follows_the_visitor(self):
+        '''Кнопка подписки показывает состояние текущего пользователя'''
+        url = reverse('posts:profile',
+                      kwargs={'username': PageCacheTests.author.username})
+        self.assertContains(self.reader_client.get(url), 'Подписаться')
+        Follow.objects.create(user=PageCacheTests.reader,
+                              author=PageCacheTests.author)
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        self.assertNotContains(self.author_client.get(url), 'Подписаться')
+
+    def test_writes_reset_cached_pages(self):
+        '''Новый пост и комментарий сбрасывают кэш страниц'''
+        for url in self.urls:
+            self.guest_client.get(url)
+        with committed():
+            post = Post.objects.create(text='Свежий пост',
+                                       author=PageCacheTests.author,
+                                       group=PageCacheTests.group)
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        with committed():
+            Comment.objects.create(post=PageCacheTests.post,
+                                   author=PageCacheTests.reader,
+                                   text='Свежий комментарий')
+        self.assertContains(self.guest_client.get(self.urls[3]),
+                            'Свежий комментарий')
+
+    def test_writes_reset_cache_after_commit(self):
+        '''Кэш сбрасывается только после фиксации транзакции'''
+        url = self.urls[0]
+        self.guest_client.get(url)
+        with committed():
+            Post.objects.create(text='Незафиксированный пост',
+                                author=PageCacheTests.author)
+            self.assertNotContains(self.guest_client.get(url),
+                                   'Незафиксированный пост')
+        self.assertContains(self.guest_client.get(url),
+                            'Незафиксированный пост')
+
+    def test_stale_page_is_not_cached(self):
+        '''Страница из устаревшей ленты, пока её пересчитывает другой
+        запрос, не остаётся в кэше'''
+        url = self.urls[0]
+        self.guest_client.get(url)
+        with committed():
+            Post.objects.create(text='Пост во время пересчёта',
+                                author=PageCacheTests.author)
+        paginator = CachedPaginator(Post.objects.all(), POSTS_ON_PAGE,
+                                    INDEX_PAGE,
+                                    namespaces=(INDEX_PAGE, FEEDS_NAMESPACE))
+        locks = [stampede.LOCK_KEY % paginator.build_cache_key(key)
+                 for key in (1, 'count')]
+        for lock in locks:
+            cache.add(lock, True)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Пост во время пересчёта')
+        self.assertFalse(response.has_header('ETag'))
+        cache.delete_many(locks)
+        self.assertContains(Client().get(url), 'Пост во время пересчёта')
+        self.assertContains(self.reader_client.get(url),
+                            'Пост во время пересчёта')
+
+    def test_comment_form_is_rendered_for_each_user(self):
+        '''Форма комментария с csrf-токеном есть только у пользователя'''
+        url = self.urls[3]
+        self.guest_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertNotContains(self.guest_client.get(url),
+                               'Добавить комментарий')
+
+    def test_missing_pages_are_not_cached(self):
+        '''Несуществующие группа и профиль отдают 404'''
+        for url in ('/group/no-such-group/', '/profile/no-such-user/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+
+class HoleMarkerTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def test_signed_hole_is_filled(self):
+        '''Метка из make_hole заменяется отрисованным фрагментом'''
+        skeleton = 'до|%s|после' % make_hole(
+            'posts/includes/edit_link.html', {'post_id': 1, 'author_id': None})
+        self.assertIn('редактировать пост', fill_holes(self.request, skeleton))
+
+    def test_forged_hole_is_dropped(self):
+        '''Метка без подписи, например из текста поста, выбрасывается'''
+        for template_name in ('posts/includes/edit_link.html',
+                              'no/such/template.html'):
+            with self.subTest(template_name=template_name):
+                payload = json.dumps([template_name, {'post_id': 1}])
+                forged = '<!--hole:%s-->' % base64.urlsafe_b64encode(
+                    payload.encode()).decode()
+                tampered = make_hole(template_name, {'post_id': 1})[:-4]
+                self.assertEqual(
+                    fill_holes(self.request, 'до|%s|%s-->|после' % (
+                        forged, tampered)),
+                    'до|||после')
+
+
+class PageKeyTests(SimpleTestCase):
+    def key(self, path):
+        return build_page_key('anonymous', (1, 2), RequestFactory().get(path))
+
+    def test_unknown_parameters_share_the_page(self):
+        '''Лишние параметры запроса не заводят новых записей в кэше'''
+        self.assertEqual(self.key('/?x=1'), self.key('/?utm=2&x=3'))
+        self.assertEqual(self.key('/?page=2&x=1'), self.key('/?page=2'))
+        self.assertEqual(self.key('/?q=горы&page=2'),
+                         self.key('/?page=2&q=горы'))
+
+    def test_view_parameters_make_different_pages(self):
+        '''Страницы с разными номерами и курсорами кэшируются отдельно'''
+        keys = {self.key(path) for path in (
+            '/', '/?page=2', '/?cursor=abc', '/?format=json', '/?q=горы',
+            '/group/slug/')}
+        self.assertEqual(len(keys), 6)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..views import POSTS_ON_PAGE
+
+User = get_user_model()
+
+# Предельное число запросов к базе для страниц лент, включая сессию и
+# пользователя, при пустом кэше: тогда группа, автор или пост ищутся ещё
+# и для валидаторов страницы (core.page_cache). Оно не зависит от числа
+# постов и комментариев: рост выдаёт вернувшийся запрос N+1.
+MAX_QUERIES = {
+    'posts:index': 4,
+    'posts:group_posts': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    'posts:follow_index': 5,
+}
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='query-reader')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='query-group')
+        cls.author = User.objects.create_user(
+            username='query-author', first_name='Имя', last_name='Фамилия')
+        for number in range(POSTS_ON_PAGE * 2):
+            author = User.objects.create_user(username=f'author-{number}')
+            group = Group.objects.create(title=f'Группа {number}',
+                                         description='Описание',
+                                         slug=f'group-{number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(text=f'Пост {number}', author=author,
+                                group=group)
+            Post.objects.create(text=f'Пост в группе {number}',
+                                author=cls.author, group=cls.group)
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for number in range(POSTS_ON_PAGE):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.get(username=f'author-{number}'),
+                text=f'Комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FeedQueriesTests.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts',
+                kwargs={'slug': FeedQueriesTests.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile',
+                kwargs={'username': FeedQueriesTests.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': FeedQueriesTests.post.pk}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_feed_pages_do_not_run_queries_per_post(self):
+        '''Число запросов страниц лент не растёт с числом постов'''
+        for name, url in self.urls().items():
+            with self.subTest(page=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries), MAX_QUERIES[name],
+                    '\n'.join(query['sql']
+                              for query in queries.captured_queries))
+
+    def test_post_detail_counts_come_with_post(self):
+        '''Счётчики на странице поста приходят вместе с постом'''
+        response = self.client.get(self.urls()['posts:post_detail'])
+        post = response.context['post']
+        self.assertEqual(post.author.stats.posts_count,
+                         Post.objects.filter(author=post.author).count())
+        self.assertEqual(post.comments_count, POSTS_ON_PAGE)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.stemmer import stem
+from ..models import Post
+from ..search import search
+from ..views import POSTS_ON_PAGE
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        '''Формы одного слова сводятся к одной основе'''
+        for forms in (('котёнка', 'котенку', 'котенком'),
+                      ('прогулка', 'прогулки', 'прогулкой', 'прогулку'),
+                      ('красивый', 'красивая', 'красивые', 'красивого')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_other_words_are_lowercased(self):
+        '''Некириллические слова только приводятся к нижнему регистру'''
+        self.assertEqual(stem('Django'), 'django')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='search-author')
+        self.cat_post = Post.objects.create(
+            text='Мы гуляли с котёнком в парке', author=self.author)
+        self.dog_post = Post.objects.create(
+            text='Собаки гуляют в парке', author=self.author)
+
+    def found(self, query):
+        return set(search(Post.objects.all(), query))
+
+    def test_search_matches_all_word_forms(self):
+        '''Поиск находит посты по любой форме всех слов запроса'''
+        self.assertEqual(self.found('котенка'), {self.cat_post})
+        self.assertEqual(self.found('парк'),
+                         {self.cat_post, self.dog_post})
+        self.assertEqual(self.found('собака в парке'), {self.dog_post})
+        self.assertEqual(self.found('"кошка" OR *'), set())
+        self.assertEqual(self.found('  '), set())
+
+    def test_index_follows_saves_and_deletes(self):
+        '''Индекс обновляется при изменении и удалении поста'''
+        self.cat_post.text = 'Котёнку снится прогулка'
+        self.cat_post.save()
+        self.assertEqual(self.found('гулять'), {self.dog_post})
+        self.assertEqual(self.found('прогулки котенка'), {self.cat_post})
+        self.dog_post.delete()
+        self.assertEqual(self.found('гулять'), set())
+
+    def test_search_page_is_paginated(self):
+        '''Страница поиска выводит результаты по страницам с запросом'''
+        for number in range(POSTS_ON_PAGE + 1):
+            Post.objects.create(text=f'Прогулка номер {number}',
+                                author=self.author)
+        response = Client().get(reverse('posts:search'),
+                                {'q': 'прогулки'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_PAGE)
+        self.assertContains(response, 'q=%D0%BF%D1%80%D0%BE')
+        self.assertContains(response, 'cursor=')
+
+    def test_admin_search_uses_index(self):
+        '''Поиск в админке идёт по тому же индексу'''
+        admin = User.objects.create_superuser(
+            username='search-admin', email='admin@example.com',
+            password='password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'котенка'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.cat_post])
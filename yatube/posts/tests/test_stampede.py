@@ -0,0 +1,123 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from core import stampede
+from core.cache_namespaces import bump
+from core.cached_paginator import CachedPaginator
+from ..models import Post
+
+User = get_user_model()
+
+
+class Computation:
+    '''Счётчик вызовов пересчёта с задержкой'''
+
+    def __init__(self, value, delay=0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+class FetchTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        '''Одновременные промахи пересчитывают значение один раз'''
+        compute = Computation('value', delay=0.2)
+        results = []
+
+        def request():
+            results.append(stampede.fetch('key', compute))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_stale_value_while_recomputing(self):
+        '''Пока значение пересчитывает другой запрос, отдаётся старое'''
+        with stampede.tracking_stale() as served_stale:
+            stampede.fetch('old', Computation('old'), stale_key='stale')
+        self.assertFalse(served_stale())
+        cache.add(stampede.LOCK_KEY % 'new', True)
+        compute = Computation('new')
+        with stampede.tracking_stale() as served_stale:
+            self.assertEqual(
+                stampede.fetch('new', compute, stale_key='stale'), 'old')
+        self.assertTrue(served_stale())
+        self.assertEqual(compute.calls, 0)
+
+    @mock.patch.object(stampede, 'WAIT_TIMEOUT', 0.1)
+    def test_stuck_recompute_is_not_waited_for(self):
+        '''Без старого значения запрос ждёт пересчёт недолго'''
+        cache.add(stampede.LOCK_KEY % 'key', True)
+        compute = Computation('value')
+        self.assertEqual(stampede.fetch('key', compute), 'value')
+        self.assertEqual(compute.calls, 1)
+
+    def test_early_refresh(self):
+        '''Значение пересчитывается до истечения, и тем раньше,
+        чем дольше пересчёт'''
+        stampede.fetch('key', Computation('old'), timeout=60)
+        value, _, expires = cache.get('key')
+        compute = Computation('new')
+        with mock.patch('random.random', return_value=0.5):
+            cache.set('key', (value, 0.001, expires))
+            self.assertEqual(stampede.fetch('key', compute), 'old')
+            cache.set('key', (value, 100, expires))
+            self.assertEqual(stampede.fetch('key', compute, timeout=60),
+                             'new')
+        self.assertEqual(compute.calls, 1)
+        self.assertFalse(cache.has_key(stampede.LOCK_KEY % 'key'))
+
+    def test_failed_recompute_releases_lock(self):
+        '''Упавший пересчёт не оставляет блокировку'''
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            stampede.fetch('key', fail)
+        self.assertFalse(cache.has_key(stampede.LOCK_KEY % 'key'))
+
+
+class CachedPaginatorStampedeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='stampede-author')
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CachedPaginator(Post.objects.all(), 2, 'stampede_page')
+
+    def test_bumped_page_is_served_stale_while_recomputed(self):
+        '''После записи страницу пересчитывает один запрос, остальные
+        получают прежнюю без запросов к базе'''
+        old_page = list(self.paginator().page(1))
+        bump('stampede_page')
+        paginator = self.paginator()
+        for key in (paginator.build_cache_key(1),
+                    paginator.build_cache_key('count')):
+            cache.add(stampede.LOCK_KEY % key, True)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(paginator.page(1)), old_page)
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.storage import ContentAddressedStorage
+from ..models import Post
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+DIGEST_NAME = f'posts/{hashlib.sha256(SMALL_GIF).hexdigest()}.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='storage-author')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_identical_uploads_share_one_file(self):
+        '''Одинаковые картинки хранятся одним файлом под хэшем'''
+        posts = [
+            Post.objects.create(
+                text='Пост', author=self.author,
+                image=SimpleUploadedFile(name, SMALL_GIF,
+                                         content_type='image/gif'))
+            for name in ('small.gif', 'copy.GIF')
+        ]
+        self.assertEqual({post.image.name for post in posts}, {DIGEST_NAME})
+        self.assertEqual(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts')),
+                         [os.path.basename(DIGEST_NAME)])
+
+    def test_different_content_gets_different_names(self):
+        '''Разное содержимое получает разные имена'''
+        storage = ContentAddressedStorage()
+        first = storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        second = storage.save('posts/a.gif', ContentFile(SMALL_GIF + b'!'))
+        self.assertEqual(first, DIGEST_NAME)
+        self.assertNotEqual(first, second)
+        with storage.open(second) as stored:
+            self.assertEqual(stored.read(), SMALL_GIF + b'!')
+
+    def test_reused_file_is_touched(self):
+        '''Повторно сохранённый файл выглядит новым для чистки'''
+        storage = ContentAddressedStorage()
+        name = storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        os.utime(storage.path(name), (0, 0))
+        storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.assertGreater(os.path.getmtime(storage.path(name)), 0)
+
+    def test_dedupe_images_moves_old_copies(self):
+        '''Команда dedupe_images сводит старые копии в один файл'''
+        posts_dir = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        os.makedirs(posts_dir)
+        for name in ('image.gif', 'image_abc.gif'):
+            with open(os.path.join(posts_dir, name), 'wb') as image:
+                image.write(SMALL_GIF)
+            Post.objects.create(text='Пост', author=self.author,
+                                image=f'posts/{name}')
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)), {DIGEST_NAME})
+        self.assertEqual(os.listdir(posts_dir),
+                         [os.path.basename(DIGEST_NAME)])
+        self.assertIn(f'освобождено байт: {len(SMALL_GIF)}', out.getvalue())
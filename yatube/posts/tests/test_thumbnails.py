@@ -0,0 +1,134 @@
+import io
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+from .test_page_cache import committed
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='thumbnail-author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки хранятся одним файлом, а ссылки на его
+        # миниатюры sorl-thumbnail держит и в кэше.
+        cache.clear()
+        thumbnails._pending.clear()
+
+    def create_post(self, content=SMALL_GIF, name='small.gif'):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = Post.objects.create(
+                text='Пост с картинкой',
+                author=ThumbnailsTests.author,
+                image=SimpleUploadedFile(name, content),
+            )
+        schedule.assert_called_once_with(post.image.name)
+        return post
+
+    def test_saved_post_schedules_thumbnails(self):
+        '''Новая картинка ставится в очередь, прежняя - нет'''
+        post = self.create_post()
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post.text = 'Новый текст'
+            post.save()
+        schedule.assert_not_called()
+
+    def test_url_falls_back_to_original_until_generated(self):
+        '''Пока миниатюры нет, выводится исходная картинка'''
+        post = self.create_post()
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.assertEqual(thumbnails.cached_url(post.image, 'card'),
+                             post.image.url)
+        schedule.assert_called_once_with(post.image.name)
+
+        self.assertEqual(thumbnails.generate(post.image.name),
+                         len(thumbnails.THUMBNAIL_VARIANTS))
+        url = thumbnails.cached_url(post.image, 'card')
+        self.assertNotEqual(url, post.image.url)
+        self.assertTrue(url.startswith(settings.MEDIA_URL + 'cache/'))
+        self.assertEqual(thumbnails.generate(post.image.name), 0)
+
+    def test_work_runs_after_commit(self):
+        '''Миниатюры создаются после фиксации транзакции'''
+        post = self.create_post()
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            thumbnails.schedule(post.image.name)
+        callback = on_commit.call_args[0][0]
+        with mock.patch.object(thumbnails, 'generate',
+                               return_value=1) as generate:
+            callback()
+        generate.assert_called_once_with(post.image.name)
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_queued_image_is_submitted_once(self):
+        '''Картинка, которая уже ждёт в очереди, туда не добавляется'''
+        post = self.create_post()
+        with mock.patch.object(thumbnails, '_get_executor') as executor:
+            for _ in range(3):
+                with committed():
+                    thumbnails.cached_url(post.image, 'card')
+                    thumbnails.srcset(post.image, 'card')
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails._work, post.image.name)
+        with mock.patch.object(thumbnails, 'generate', return_value=0):
+            thumbnails._work(post.image.name)
+        with mock.patch.object(thumbnails, '_get_executor') as executor:
+            with committed():
+                thumbnails.cached_url(post.image, 'card')
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails._work, post.image.name)
+
+    def test_srcset_lists_generated_widths(self):
+        '''srcset перечисляет готовые миниатюры всех ширин'''
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 400)).save(buffer, 'PNG')
+        post = self.create_post(buffer.getvalue(), 'wide.png')
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.assertEqual(thumbnails.srcset(post.image, 'card'), '')
+        schedule.assert_called_once_with(post.image.name)
+
+        thumbnails.generate(post.image.name)
+        srcset = thumbnails.srcset(post.image, 'card')
+        widths = [candidate.split()[1] for candidate in srcset.split(', ')]
+        # Кроме основной ширины миниатюры не увеличиваются, поэтому
+        # самая широкая совпадает с исходной картинкой.
+        self.assertEqual(widths, ['320w', '640w', '960w', '1000w'])
+        self.assertIn(thumbnails.cached_url(post.image, 'card') + ' 960w',
+                      srcset)
+
+    @skipUnless(thumbnails.WEBP_ENABLED, 'Pillow собран без WebP')
+    def test_webp_srcset(self):
+        '''Для каждой ширины есть миниатюра в WebP'''
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        srcset = thumbnails.srcset(post.image, 'card', webp=True)
+        self.assertEqual(srcset.count('.webp '), 1)
@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import counters, thumbnails, transfer
+from ..feeds import follow_feed
+from ..models import Comment, FeedEntry, Follow, Group, Post
+from ..search import search
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+OLD_DATE = datetime(2020, 5, 17, 10, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+@mock.patch.object(thumbnails, 'schedule')
+class TransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.group = Group.objects.create(
+            title='Группа', slug='transfer-group', description='Описание')
+        self.author = User.objects.create_user(username='transfer-author')
+        self.reader = User.objects.create_user(username='transfer-reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(
+            text='Путешествия по горам\nи "рекам", с запятыми',
+            author=self.author, group=self.group,
+            image=ContentFile(SMALL_GIF, name='small.gif'))
+        Post.objects.filter(pk=self.post.pk).update(pub_date=OLD_DATE)
+        Post.objects.create(text='Пост без группы', author=self.reader)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def snapshot(self) -> dict:
+        return {name: list(transfer.exported(name))
+                for name in transfer.MODELS}
+
+    def clear(self):
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def test_round_trip(self, schedule):
+        '''Выгруженные данные загружаются обратно такими же, со
+        счётчиками, лентами и поиском'''
+        for format in transfer.FORMATS:
+            with self.subTest(format=format):
+                expected = self.snapshot()
+                call_command('export_posts', self.directory, format=format,
+                             stdout=StringIO())
+                self.clear()
+                out = StringIO()
+                call_command('import_posts', self.directory, batch_size=1,
+                             stdout=out)
+                self.assertEqual(self.snapshot(), expected)
+                self.assertIn('posts: 2 строк', out.getvalue())
+                self.assertEqual(Post.objects.get(
+                    group__slug='transfer-group').pub_date, OLD_DATE)
+                self.assertFalse(any(counters.reconcile().values()))
+                reader = User.objects.get(username='transfer-reader')
+                self.assertEqual(len(follow_feed(reader)), 1)
+                self.assertEqual(
+                    search(Post.objects.all(), 'горы').count(), 1)
+                shutil.rmtree(self.directory)
+
+    def test_import_is_repeatable(self, schedule):
+        '''Повторная загрузка пропускает уже загруженные записи'''
+        call_command('export_posts', self.directory, stdout=StringIO())
+        out = StringIO()
+        call_command('import_posts', self.directory, stdout=out)
+        for name in transfer.MODELS:
+            self.assertIn(f'{name}: ', out.getvalue())
+        self.assertIn('posts: 2 строк', out.getvalue())
+        self.assertIn('создано 0, пропущено 2', out.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(FeedEntry.objects.count(), 1)
+        self.assertFalse(any(counters.reconcile().values()))
+
+    def test_images_are_copied(self, schedule):
+        '''Картинки копируются вместе с постами'''
+        call_command('export_posts', self.directory, images=True,
+                     stdout=StringIO())
+        image = self.post.image.name
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, 'media', image)))
+        self.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT)
+        out = StringIO()
+        call_command('import_posts', self.directory, images=True,
+                     stdout=out)
+        self.assertTrue(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, image)))
+        self.assertIn('Картинок скопировано: 1', out.getvalue())
+
+    def test_sequences_are_reset(self, schedule):
+        '''После загрузки с явными id новые записи получают свободные id'''
+        call_command('export_posts', self.directory, stdout=StringIO())
+        self.clear()
+        with mock.patch.object(transfer.connection.ops, 'sequence_reset_sql',
+                               return_value=[]) as reset:
+            call_command('import_posts', self.directory, stdout=StringIO())
+        self.assertEqual(reset.call_count, len(transfer.MODELS))
+        self.assertEqual(reset.call_args[0][1], [Group, Post, Comment])
+        post = Post.objects.create(text='Новый пост', author=User.objects.get(
+            username='transfer-author'))
+        self.assertGreater(post.pk, self.post.pk)
+
+    def test_taken_ids_are_refused(self, schedule):
+        '''Загрузка не идёт, если id из файла заняты другими записями'''
+        call_command('export_posts', self.directory, stdout=StringIO())
+        self.clear()
+        author = User.objects.create_user(username='local-author')
+        Post.objects.create(pk=self.post.pk, text='Местный пост',
+                            author=author)
+        with self.assertRaisesMessage(CommandError,
+                                      f'posts: id {self.post.pk} в базе'):
+            call_command('import_posts', self.directory, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_images_keep_their_names(self, schedule):
+        '''Картинка со старым именем копируется под ним же'''
+        name = 'posts/old-name.gif'
+        shutil.copy(self.post.image.path,
+                    os.path.join(TEMP_MEDIA_ROOT, name))
+        Post.objects.filter(pk=self.post.pk).update(image=name)
+        call_command('export_posts', self.directory, images=True,
+                     stdout=StringIO())
+        self.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT)
+        out = StringIO()
+        call_command('import_posts', self.directory, images=True,
+                     stdout=out)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).image.name, name)
+        self.assertTrue(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+        self.assertIn('Картинок скопировано: 1', out.getvalue())
+        call_command('import_posts', self.directory, images=True,
+                     stdout=out)
+        self.assertIn('Картинок скопировано: 0', out.getvalue())
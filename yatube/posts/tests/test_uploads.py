@@ -0,0 +1,88 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..forms import IMAGE_ERRORS
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name, image_format, size, **options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format,
+                                               **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='upload-author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ImageUploadTests.author)
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'),
+                                {'text': 'Пост с картинкой', 'image': image})
+
+    @override_settings(IMAGE_STORED_SIDE=100)
+    def test_image_is_reencoded_within_bounds(self):
+        '''Картинка уменьшается и сохраняется без метаданных'''
+        exif = Image.Exif()
+        exif[0x010E] = 'Описание с камеры'
+        self.create(image_file('photo.jpeg', 'JPEG', (400, 300),
+                               exif=exif.tobytes()))
+        post = Post.objects.get(author=ImageUploadTests.author)
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{64}\.jpg$')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (100, 75))
+            self.assertNotIn('exif', stored.info)
+
+    def test_rejections(self):
+        '''Слишком большие картинки отклоняются до декодирования'''
+        cases = {
+            'too_many_pixels': {'IMAGE_MAX_PIXELS': 100},
+            'too_wide': {'IMAGE_MAX_SIDE': 20},
+            'too_large': {'IMAGE_UPLOAD_MAX_SIZE': 10},
+        }
+        for code, limits in cases.items():
+            with self.subTest(code=code), override_settings(**limits):
+                response = self.create(
+                    image_file('big.png', 'PNG', (50, 50)))
+                self.assertFormError(response, 'form', 'image',
+                                     IMAGE_ERRORS[code])
+        self.assertFalse(Post.objects.exists())
+
+    def test_animated_image_is_rejected(self):
+        '''Анимированная картинка отклоняется, а не теряет кадры'''
+        frames = [Image.new('RGB', (10, 10), color)
+                  for color in ('red', 'green')]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        response = self.create(
+            SimpleUploadedFile('animated.gif', buffer.getvalue()))
+        self.assertFormError(response, 'form', 'image',
+                             IMAGE_ERRORS['animated'])
+        self.assertFalse(Post.objects.exists())
+        self.create(image_file('still.gif', 'GIF', (10, 10)))
+        self.assertEqual(Post.objects.count(), 1)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -8,9 +9,12 @@ from django.conf import settings
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from ..views import POSTS_ON_PAGE
 from ..models import Post, Group, Follow
+from .test_page_cache import committed
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -25,7 +29,7 @@ def last_page_parameters(posts_total):
     return last_page_num, posts_on_last_page
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -259,14 +263,15 @@ class PostViewsTests(TestCase):
                 reverse('posts:profile',
                         kwargs={'username': PostViewsTests.author1})),
         }
+        image_name = f'posts/{hashlib.sha256(small_gif).hexdigest()}.gif'
         for value in response_dict.values():
             with self.subTest(value=value):
-                self.assertEqual('posts/small.gif',
+                self.assertEqual(image_name,
                                  value.context['page_obj'][0].image)
         post_detail_response = self.authorized_client.get(
             reverse('posts:post_detail',
                     kwargs={'post_id': post_with_image.pk}))
-        self.assertEqual('posts/small.gif',
+        self.assertEqual(image_name,
                          post_detail_response.context['post'].image)
 
     def test_profile_follow(self):
@@ -329,18 +334,156 @@ class PostViewsTests(TestCase):
                     ) + '?page=' + str(last_page_num))
         self.assertEqual(len(response.context['page_obj']), posts_on_last_page)
 
+    def test_index_keyset_pages_cover_all_posts(self):
+        '''Переход по курсорам проходит всю ленту без пропусков и повторов'''
+        expected = list(Post.objects.order_by('-pub_date', '-pk')
+                        .values_list('pk', flat=True))
+        response = self.client.get(reverse('posts:index'))
+        seen = [post.pk for post in response.context['page_obj']]
+        while response.context['page_obj'].has_next():
+            response = self.client.get(
+                reverse('posts:index'),
+                {'cursor': response.context['page_obj'].next_cursor})
+            seen += [post.pk for post in response.context['page_obj']]
+        self.assertEqual(seen, expected)
+
+    def test_keyset_previous_and_last_pages(self):
+        '''Курсоры ведут на предыдущую и на последнюю страницы'''
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        second = self.client.get(
+            reverse('posts:index'),
+            {'cursor': first.next_cursor}).context['page_obj']
+        back = self.client.get(
+            reverse('posts:index'),
+            {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in first])
+        self.assertFalse(back.has_previous())
+        last = self.client.get(
+            reverse('posts:index'),
+            {'cursor': first.last_cursor}).context['page_obj']
+        self.assertEqual(len(last), POSTS_ON_PAGE)
+        self.assertFalse(last.has_next())
+        self.assertEqual(last[len(last) - 1].pk,
+                         Post.objects.order_by('pub_date', 'pk').first().pk)
+
+    def test_keyset_deep_page_costs_as_second_page(self):
+        '''Глубокая страница по курсору выбирается одним запросом
+            без OFFSET и COUNT'''
+        url = reverse('posts:index')
+        page_obj = self.client.get(url).context['page_obj']
+        pages = 0
+        while page_obj.has_next():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url,
+                                           {'cursor': page_obj.next_cursor})
+            page_obj = response.context['page_obj']
+            pages += 1
+            feed_queries = [query['sql'] for query in queries.captured_queries
+                            if 'FROM "posts_post"' in query['sql']]
+            self.assertEqual(len(feed_queries), 1)
+            self.assertNotIn('OFFSET', feed_queries[0])
+            self.assertNotIn('COUNT', feed_queries[0])
+        self.assertGreater(pages, 1)
+
+    def test_broken_cursor_shows_first_page(self):
+        '''Испорченный курсор открывает первую страницу'''
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'][0].pk,
+                         Post.objects.latest('pub_date').pk)
+
+    def test_out_of_range_page_shows_last_page(self):
+        '''Номер за концом ленты открывает последнюю страницу,
+        не число - первую'''
+        (last_page_num,
+         posts_on_last_page) = last_page_parameters(Post.objects.count())
+        response = self.client.get(reverse('posts:index'),
+                                   {'page': last_page_num + 1})
+        self.assertEqual(len(response.context['page_obj']),
+                         posts_on_last_page)
+        response = self.client.get(reverse('posts:index'),
+                                   {'page': 'not-a-number'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Главная страница берётся из кэша, пока в ленту ничего
+            не записано, и сбрасывается новым постом."""
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
-            text='test_new_post',
-            author=self.author1,
-        )
-        response_old = self.authorized_client.get(reverse('posts:index'))
-        posts_old = response_old.content
-        self.assertEqual(posts_old, posts)
-        cache.clear()
+        # update() не отправляет сигналы: кэш об этом изменении не знает.
+        Post.objects.filter(
+            pk=Post.objects.latest('pub_date').pk
+        ).update(text='Текст, который не попадёт в кэш')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_cached.content, posts)
+        with committed():
+            Post.objects.create(
+                text='test_new_post',
+                author=self.author1,
+            )
         response_new = self.authorized_client.get(reverse('posts:index'))
-        posts_new = response_new.content
-        self.assertNotEqual(posts_old, posts_new)
+        self.assertNotEqual(response_new.content, posts)
+        self.assertContains(response_new, 'test_new_post')
+
+    def test_cache_is_reset_by_related_writes(self):
+        """Ленты сбрасываются правкой поста, группы и автора."""
+        post = Post.objects.filter(group=PostViewsTests.group1).latest(
+            'pub_date')
+        group1_url = reverse('posts:group_posts',
+                             kwargs={'slug': PostViewsTests.group1.slug})
+        group2_url = reverse('posts:group_posts',
+                             kwargs={'slug': PostViewsTests.group2.slug})
+        profile_url = reverse('posts:profile',
+                              kwargs={'username': post.author.username})
+        for url in (group1_url, group2_url, profile_url):
+            self.client.get(url)
+        post.text = 'Пост перенесён в другую группу'
+        post.group = PostViewsTests.group2
+        with committed():
+            post.save()
+        self.assertNotIn(
+            post, self.client.get(group1_url).context['page_obj'])
+        self.assertContains(self.client.get(group2_url), post.text)
+        self.assertContains(self.client.get(profile_url), post.text)
+
+        PostViewsTests.author2.first_name = 'Новое'
+        PostViewsTests.author2.last_name = 'Имя'
+        with committed():
+            PostViewsTests.author2.save()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'Новое Имя')
+
+    def test_cached_index_runs_no_queries(self):
+        """Страница ленты из кэша не обращается к базе, включая
+            подсчёт постов для паджинатора."""
+        for page in ('1', '2'):
+            with self.subTest(page=page):
+                self.client.get(reverse('posts:index'), {'page': page})
+                with self.assertNumQueries(0):
+                    response = self.client.get(reverse('posts:index'),
+                                               {'page': page})
+                self.assertEqual(response.context['page_obj'].number,
+                                 int(page))
+
+    def test_cached_count_is_reset_with_pages(self):
+        """Число страниц сбрасывается вместе со страницами ленты."""
+        response = self.client.get(reverse('posts:index'))
+        num_pages = response.context['page_obj'].paginator.num_pages
+        with committed():
+            for _ in range(POSTS_ON_PAGE):
+                Post.objects.create(text='Ещё один пост', author=self.author1)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.num_pages,
+                         num_pages + 1)
+
+    def test_login_keeps_cache(self):
+        """Вход пользователя не сбрасывает ленты."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(
+            pk=Post.objects.latest('pub_date').pk
+        ).update(text='Текст, который не попадёт в кэш')
+        self.client.force_login(PostViewsTests.author2)
+        self.assertNotContains(self.client.get(reverse('posts:index')),
+                               'Текст, который не попадёт в кэш')
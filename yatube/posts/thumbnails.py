@@ -0,0 +1,200 @@
+"""Миниатюры картинок постов вне обработки запроса.
+
+Сохранённый пост ставит свою картинку в очередь локального пула
+потоков, и миниатюры всех вариантов из ``THUMBNAIL_VARIANTS`` готовятся
+после фиксации транзакции. Шаблоны только ищут готовую миниатюру в
+хранилище ключей sorl-thumbnail; пока её нет, выводится исходная
+картинка, а генерация ставится в очередь. Картинка, которая уже стоит
+в очереди процесса, второй раз туда не попадает, сколько бы страниц с
+ней ни отрисовалось.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+from core.cache_namespaces import bump
+from .models import Post
+from .utils import post_write_namespaces
+
+logger = logging.getLogger(__name__)
+
+# Картинки, которые шаблоны выводят в нескольких ширинах:
+# имя -> (основная ширина, высота при ней, опции sorl-thumbnail).
+RESPONSIVE_IMAGES: dict = {
+    'card': (960, 339, {'crop': 'center'}),
+}
+RESPONSIVE_WIDTHS: tuple = (320, 640, 960, 1920)
+# WebP есть не в каждой сборке Pillow.
+WEBP_ENABLED: bool = features.check('webp')
+
+
+def variant_name(image: str, width: int, webp: bool = False) -> str:
+    return f'{image}:{width}:webp' if webp else f'{image}:{width}'
+
+
+def _responsive_variants() -> dict:
+    variants = {}
+    for image, (base_width, base_height, options) in RESPONSIVE_IMAGES.items():
+        for width in RESPONSIVE_WIDTHS:
+            geometry = f'{width}x{round(width * base_height / base_width)}'
+            # Увеличивается только основная ширина: она же идёт в src.
+            width_options = {**options, 'upscale': width == base_width}
+            variants[variant_name(image, width)] = (geometry, width_options)
+            if WEBP_ENABLED:
+                variants[variant_name(image, width, webp=True)] = (
+                    geometry, {**width_options, 'format': 'WEBP'}
+                )
+    return variants
+
+
+# Все миниатюры, которые выводят шаблоны: вариант -> (геометрия, опции).
+THUMBNAIL_VARIANTS: dict = _responsive_variants()
+
+_executor = None
+_executor_lock = threading.Lock()
+# Картинки в очереди пула или в работе.
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def source(image) -> ImageFile:
+    """Картинка поста по имени или файлу поля, всегда в хранилище поля:
+    от него зависят имена миниатюр."""
+    return ImageFile(getattr(image, 'name', image),
+                     Post._meta.get_field('image').storage)
+
+
+class PrecomputedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд, который умеет найти готовую миниатюру, не создавая её."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Миниатюра с тем же именем, что дал бы ``get_thumbnail``."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+backend = PrecomputedThumbnailBackend()
+
+
+def cached_url(image, variant: str) -> str:
+    """Адрес готовой миниатюры, а пока её нет - исходной картинки.
+
+    Для картинки из ``RESPONSIVE_IMAGES`` берётся основная ширина.
+    """
+    if variant in RESPONSIVE_IMAGES:
+        variant = variant_name(variant, RESPONSIVE_IMAGES[variant][0])
+    geometry, options = THUMBNAIL_VARIANTS[variant]
+    thumbnail = backend.cached_thumbnail(source(image), geometry, **options)
+    if thumbnail is not None:
+        return thumbnail.url
+    schedule(image.name)
+    return image.url
+
+
+def srcset(image, name: str, webp: bool = False) -> str:
+    """Значение srcset из готовых миниатюр всех ширин картинки.
+
+    Недостающие миниатюры ставятся в очередь и в srcset не попадают.
+    """
+    candidates = {}
+    missing = False
+    for width in RESPONSIVE_WIDTHS:
+        geometry, options = THUMBNAIL_VARIANTS[
+            variant_name(name, width, webp)]
+        thumbnail = backend.cached_thumbnail(source(image), geometry,
+                                             **options)
+        if thumbnail is None:
+            missing = True
+        else:
+            # Без увеличения миниатюра может оказаться уже заказанной.
+            candidates.setdefault(thumbnail.width, thumbnail.url)
+    if missing:
+        schedule(image.name)
+    return ', '.join(f'{url} {width}w'
+                     for width, url in sorted(candidates.items()))
+
+
+def generate(image_name: str) -> int:
+    """Создаёт недостающие миниатюры картинки.
+
+    Возвращает число созданных миниатюр.
+    """
+    created = 0
+    image = source(image_name)
+    with metrics.timed('thumbnails'):
+        for geometry, options in THUMBNAIL_VARIANTS.values():
+            if backend.cached_thumbnail(image, geometry, **options):
+                continue
+            backend.get_thumbnail(image, geometry, **options)
+            created += 1
+    return created
+
+
+def _work(image_name: str) -> None:
+    try:
+        if generate(image_name):
+            # Страницы с этой картинкой могли попасть в кэш с исходным
+            # адресом вместо миниатюры.
+            for post in Post.objects.filter(image=image_name):
+                bump(*post_write_namespaces(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+    finally:
+        with _pending_lock:
+            _pending.discard(image_name)
+        close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def submit(image_name: str) -> None:
+    """Отдаёт картинку пулу, если её там ещё нет."""
+    with _pending_lock:
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+    if settings.THUMBNAIL_ASYNC:
+        _get_executor().submit(_work, image_name)
+    else:
+        _work(image_name)
+
+
+def schedule(image_name: str) -> None:
+    """Ставит картинку в очередь после фиксации текущей транзакции."""
+    if image_name:
+        transaction.on_commit(partial(submit, image_name))
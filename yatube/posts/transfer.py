@@ -0,0 +1,322 @@
+"""Выгрузка и загрузка групп, постов, комментариев и подписок потоком.
+
+Каждая модель выгружается в свой файл JSON Lines или CSV в порядке
+``MODELS``: так при загрузке группы и посты уже есть, когда до них
+доходят посты и комментарии. Память не зависит от объёма данных:
+выгрузка читает базу через ``iterator(chunk_size=...)``, загрузка читает
+файл построчно и пишет пачками ``bulk_create``, каждую в своей
+транзакции.
+
+Связи записываются естественными ключами: автор - username, группа -
+slug. Посты и комментарии сохраняют свои id, по ним комментарии находят
+посты. Записи, ключи которых уже есть в базе, пропускаются, поэтому
+прерванную загрузку можно просто запустить снова. Если же под id из
+файла в базе лежит другая запись (``conflicts``), комментарии попали бы
+к чужим постам: такой файл команда загрузки не принимает. Недостающие
+авторы создаются без пароля.
+
+``bulk_create`` не посылает сигналов, поэтому счётчики, ленты, поисковый
+индекс и версии кэша обновляются здесь же, одним запросом на пачку.
+Вставка с явными id не двигает последовательности id в PostgreSQL,
+поэтому после загрузки модели они выставляются за наибольший id.
+Миниатюры картинок создаёт команда ``warm_thumbnails``.
+"""
+import csv
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from core.cache_namespaces import bump_on_commit
+from . import counters, feeds, follows, search
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import post_page, post_write_namespaces
+
+MODELS: tuple = ('groups', 'posts', 'comments', 'follows')
+COLUMNS: dict = {
+    'groups': ('slug', 'title', 'description'),
+    'posts': ('id', 'text', 'pub_date', 'author', 'group', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+FORMATS: tuple = ('jsonl', 'csv')
+CHUNK_SIZE: int = 2000
+BATCH_SIZE: int = 1000
+
+
+def exported(name: str):
+    """Строки модели для выгрузки в порядке ``COLUMNS[name]``."""
+    querysets = {
+        'groups': Group.objects.values_list(
+            'slug', 'title', 'description'),
+        'posts': Post.objects.values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+            'image'),
+        'comments': Comment.objects.values_list(
+            'pk', 'post_id', 'author__username', 'text', 'created'),
+        'follows': Follow.objects.values_list(
+            'user__username', 'author__username'),
+    }
+    return querysets[name].order_by('pk')
+
+
+def _plain(value):
+    # DjangoJSONEncoder обрезал бы время до миллисекунд, а по нему
+    # сортируются ленты и комментарии.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def write(stream, format: str, columns: tuple, rows) -> int:
+    """Пишет строки в поток, возвращает их число."""
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+    for row in rows:
+        row = [_plain(value) for value in row]
+        if format == 'csv':
+            writer.writerow(['' if value is None else value
+                             for value in row])
+        else:
+            stream.write(json.dumps(dict(zip(columns, row)),
+                                    ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def read(stream, format: str):
+    """Записи из потока в виде словарей, по одной."""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(rows, size: int):
+    """Пачки по size записей из любого итератора."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_dates(model):
+    """Даты из файла вместо текущего времени у полей auto_now_add.
+
+    Меняет поле модели для всего процесса: только для команд загрузки.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _new_rows(model, rows) -> list:
+    """Записи, id которых ещё нет в базе, без повторов."""
+    rows = {int(row['id']): row for row in rows}
+    existing = set(model.objects.filter(pk__in=rows).order_by()
+                   .values_list('pk', flat=True))
+    return [row for pk, row in rows.items() if pk not in existing]
+
+
+def _identity(name: str, row) -> tuple:
+    """То, по чему запись из файла узнаётся в базе, помимо id."""
+    if name == 'posts':
+        return row['author'], parse_datetime(row['pub_date'])
+    return int(row['post']), row['author'], parse_datetime(row['created'])
+
+
+IDENTITIES: dict = {
+    'posts': (Post, ('author__username', 'pub_date')),
+    'comments': (Comment, ('post_id', 'author__username', 'created')),
+}
+
+
+def conflicts(name: str, rows, batch_size: int = BATCH_SIZE):
+    """id записей из файла, под которыми в базе лежат другие записи."""
+    model, fields = IDENTITIES[name]
+    for batch in batches(rows, batch_size):
+        batch = {int(row['id']): row for row in batch}
+        stored = model.objects.filter(pk__in=batch).order_by('pk')
+        for pk, *identity in stored.values_list('pk', *fields):
+            if tuple(identity) != _identity(name, batch[pk]):
+                yield pk
+
+
+def _user_ids(usernames) -> dict:
+    """id пользователей по username; недостающие создаются без пароля."""
+    usernames = set(usernames)
+    found = dict(User.objects.filter(username__in=usernames)
+                 .values_list('username', 'pk'))
+    missing = usernames - found.keys()
+    if missing:
+        users = [User(username=username) for username in missing]
+        for user in users:
+            user.set_unusable_password()
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        created = dict(User.objects.filter(username__in=missing)
+                       .values_list('username', 'pk'))
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=pk) for pk in created.values()),
+            ignore_conflicts=True)
+        found.update(created)
+    return found
+
+
+def _import_groups(rows) -> int:
+    rows = {row['slug']: row for row in rows}
+    existing = set(Group.objects.filter(slug__in=rows)
+                   .values_list('slug', flat=True))
+    Group.objects.bulk_create(
+        Group(slug=slug, title=row['title'],
+              description=row['description'])
+        for slug, row in rows.items() if slug not in existing
+    )
+    return len(rows.keys() - existing)
+
+
+def _import_posts(rows) -> int:
+    rows = _new_rows(Post, rows)
+    if not rows:
+        return 0
+    authors = _user_ids(row['author'] for row in rows)
+    groups = dict(Group.objects.filter(
+        slug__in={row['group'] for row in rows if row['group']}
+    ).values_list('slug', 'pk'))
+    posts = [
+        Post(pk=int(row['id']), text=row['text'],
+             pub_date=parse_datetime(row['pub_date']),
+             author_id=authors[row['author']],
+             group_id=groups.get(row['group']), image=row['image'] or '')
+        for row in rows
+    ]
+    with keep_dates(Post):
+        Post.objects.bulk_create(posts)
+    per_author = Counter(post.author_id for post in posts)
+    per_group = Counter(post.group_id for post in posts
+                        if post.group_id is not None)
+    counters.change(
+        *((counters.user_stats(author_id), 'posts_count', delta)
+          for author_id, delta in per_author.items()),
+        *((Group.objects.filter(pk=group_id), 'posts_count', delta)
+          for group_id, delta in per_group.items()),
+    )
+    search.get_index().update_many(posts)
+    feeds.fan_out_many(posts)
+    bump_on_commit(*{namespace for post in posts
+                     for namespace in post_write_namespaces(post)})
+    return len(posts)
+
+
+def _import_comments(rows) -> int:
+    rows = _new_rows(Comment, rows)
+    posts = set(Post.objects.filter(
+        pk__in={int(row['post']) for row in rows}
+    ).order_by().values_list('pk', flat=True))
+    # Комментарии к постам, которых нет, пропускаются.
+    rows = [row for row in rows if int(row['post']) in posts]
+    if not rows:
+        return 0
+    authors = _user_ids(row['author'] for row in rows)
+    comments = [
+        Comment(pk=int(row['id']), post_id=int(row['post']),
+                author_id=authors[row['author']], text=row['text'],
+                created=parse_datetime(row['created']))
+        for row in rows
+    ]
+    with keep_dates(Comment):
+        Comment.objects.bulk_create(comments)
+    per_post = Counter(comment.post_id for comment in comments)
+    counters.change(*(
+        (Post.objects.filter(pk=post_id), 'comments_count', delta)
+        for post_id, delta in per_post.items()
+    ))
+    bump_on_commit(*(post_page(post_id) for post_id in per_post))
+    return len(comments)
+
+
+def _import_follows(rows) -> int:
+    users = _user_ids(username for row in rows
+                      for username in (row['user'], row['author']))
+    return follows.follow_many(
+        (users[row['user']], users[row['author']]) for row in rows)
+
+
+IMPORTERS: dict = {
+    'groups': _import_groups,
+    'posts': _import_posts,
+    'comments': _import_comments,
+    'follows': _import_follows,
+}
+
+
+def reset_sequences() -> None:
+    """Выставляет последовательности id за наибольший id в таблицах."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [Group, Post, Comment])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def load(name: str, rows, batch_size: int = BATCH_SIZE):
+    """Загружает записи модели пачками.
+
+    Для каждой пачки отдаёт число прочитанных и созданных записей.
+    """
+    for batch in batches(rows, batch_size):
+        with transaction.atomic():
+            created = IMPORTERS[name](batch)
+        yield len(batch), created
+    reset_sequences()
+
+
+def _copy(source, target, name: str) -> bool:
+    if target.exists(name):
+        return False
+    with source.open(name) as content:
+        target.save(name, content)
+    return True
+
+
+def copy_images(names, source, target, workers: int,
+                batch_size: int = BATCH_SIZE) -> int:
+    """Копирует файлы names из хранилища source в target в workers
+    потоков. Возвращает число скопированных файлов.
+
+    Имена в target должны остаться прежними: на них ссылаются посты.
+    Поэтому target - простое FileSystemStorage, а не хранилище поля
+    картинки, которое переименовывает файлы по содержимому.
+    """
+    copied = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Пачками: map сразу ставит в очередь все задачи из итератора.
+        # Одну картинку могут делить несколько постов, а два потока с
+        # одним именем сохранили бы второй файл под другим.
+        for batch in batches(names, batch_size):
+            copied += sum(pool.map(
+                lambda name: _copy(source, target, name), set(batch)))
+    return copied
+
+
+def rate(count: int, elapsed: float) -> str:
+    return (f'{count} строк, {elapsed:.1f} с, '
+            f'{count / max(elapsed, 1e-6):.0f} строк в секунду')
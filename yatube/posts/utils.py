@@ -1,8 +1,107 @@
+import hashlib
+
+from django.core.cache import cache
 from django.core.paginator import Paginator, Page
+from core.cache_namespaces import get_version
 from core.cached_paginator import CachedPaginator
-from .models import Post
+from core.keyset_paginator import KeysetPaginator
+from .compact import dump_posts, load_posts
+from .models import Comment, Group, Post, User
+
+# Страницы лент живут в кэше до первой записи, которая их касается:
+# сигналы из posts.signals сбрасывают версии пространств имён.
+CACHE_TIMEOUT = None
+FEEDS_NAMESPACE: str = 'feeds'
+INDEX_PAGE: str = 'index_page'
+CURSOR_PARAM: str = 'cursor'
+KEYSET_ORDERING: tuple = ('-pub_date', '-pk')
+# Комментарии читаются от старых к новым по индексу (post, created, id).
+COMMENT_ORDERING: tuple = ('created', 'pk')
+
+
+def group_page(group_id: int) -> str:
+    return f'group_page_{group_id}'
+
+
+def profile_page(author_id: int) -> str:
+    return f'profile_page_{author_id}'
+
+
+def post_page(post_id: int) -> str:
+    return f'post_page_{post_id}'
+
+
+def _cached_pk(queryset, field: str, value: str):
+    """pk объекта по уникальному полю без обращения к базе.
+
+    Ключ привязан к версии общих лент: её сбрасывает любое изменение
+    групп и пользователей, а значит, и смена slug или username.
+    """
+    key = 'pk:%s:%s:%s:%s' % (
+        queryset.model._meta.label_lower,
+        field,
+        get_version(FEEDS_NAMESPACE),
+        hashlib.md5(value.encode()).hexdigest(),
+    )
+    pk = cache.get(key)
+    if pk is None:
+        pk = queryset.filter(**{field: value}).values_list(
+            'pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, None)
+    return pk
+
+
+def index_namespaces(request) -> list:
+    return [INDEX_PAGE, FEEDS_NAMESPACE]
+
+
+def group_namespaces(request, slug: str) -> list:
+    group_id = _cached_pk(Group.objects, 'slug', slug)
+    if group_id is None:
+        return None
+    return [group_page(group_id), FEEDS_NAMESPACE]
+
 
-CACHE_TIMEOUT: int = 20
+def profile_namespaces(request, username: str) -> list:
+    author_id = _cached_pk(User.objects, 'username', username)
+    if author_id is None:
+        return None
+    return [profile_page(author_id), FEEDS_NAMESPACE]
+
+
+def post_namespaces(request, post_id: int) -> list:
+    # Автор поста не меняется, поэтому его можно кэшировать без версии.
+    key = f'post_author:{post_id}'
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            return None
+        cache.set(key, author_id, None)
+    # На странице поста выводится и число постов автора.
+    return [post_page(post_id), profile_page(author_id), FEEDS_NAMESPACE]
+
+
+def post_comments_namespaces(request, post_id: int) -> list:
+    # JSON с комментариями не кэшируется: текст комментариев в нём
+    # не экранирован, и метки фрагментов в нём - просто данные.
+    if request.GET.get('format') == 'json':
+        return None
+    return post_namespaces(request, post_id)
+
+
+def post_write_namespaces(post: Post) -> list:
+    """Пространства имён страниц, на которых выводится пост."""
+    namespaces = [INDEX_PAGE,
+                  profile_page(post.author_id),
+                  post_page(post.pk)]
+    for group_id in (post.group_id,
+                     getattr(post, '_previous_group_id', None)):
+        if group_id is not None:
+            namespaces.append(group_page(group_id))
+    return namespaces
 
 
 def create_page(posts: Post,
@@ -12,9 +111,12 @@ def create_page(posts: Post,
     paginator = CachedPaginator(posts,
                                 posts_on_page,
                                 cache_key,
-                                CACHE_TIMEOUT
+                                CACHE_TIMEOUT,
+                                namespaces=(cache_key, FEEDS_NAMESPACE),
+                                dump=dump_posts,
+                                load=load_posts,
                                 )
-    page_obj = paginator.page(page_number)
+    page_obj = paginator.get_page(page_number)
     return page_obj
 
 
@@ -24,3 +126,45 @@ def create_page_not_cached(posts: Post,
     paginator = Paginator(posts, posts_on_page)
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def create_keyset_page(posts: Post,
+                       cursor: str,
+                       posts_on_page: int,
+                       ordering: tuple = KEYSET_ORDERING) -> Page:
+    paginator = KeysetPaginator(posts, posts_on_page, ordering)
+    page_obj = paginator.get_page(cursor)
+    return page_obj
+
+
+def paginate(request,
+             posts: Post,
+             posts_on_page: int,
+             cache_key: str = None,
+             ordering: tuple = KEYSET_ORDERING) -> Page:
+    """Страница ленты по курсору из запроса, а без него - по номеру.
+
+    Номерная страница получает курсоры соседних страниц, поэтому
+    переход дальше по ленте уже не использует OFFSET.
+    """
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor:
+        return create_keyset_page(posts, cursor, posts_on_page, ordering)
+    if cache_key is None:
+        page_obj = create_page_not_cached(posts,
+                                          request.GET.get('page'),
+                                          posts_on_page)
+    else:
+        page_obj = create_page(posts,
+                               request.GET.get('page'),
+                               posts_on_page,
+                               cache_key)
+    return KeysetPaginator(posts, posts_on_page, ordering).bind(page_obj)
+
+
+def comments_page(request, post_id: int, per_page: int) -> Page:
+    """Страница комментариев поста по курсору из запроса."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return KeysetPaginator(comments, per_page, COMMENT_ORDERING).get_page(
+        request.GET.get(CURSOR_PARAM))
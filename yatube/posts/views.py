@@ -1,33 +1,42 @@
+import json
+
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
-from .utils import create_page, create_page_not_cached
+from django.utils.http import urlencode
+from .models import Post, Group, User
+from . import comments as bulk_comments, follows
+from .utils import (paginate, comments_page, INDEX_PAGE, group_page,
+                    profile_page, index_namespaces, group_namespaces,
+                    profile_namespaces, post_namespaces,
+                    post_comments_namespaces)
+from core.page_cache import cache_page_with_holes
+from .feeds import follow_feed, FEED_ORDERING
+from .search import search as search_posts
 from posts.forms import PostForm, CommentForm
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 
 POSTS_ON_PAGE: int = 10
+COMMENTS_ON_PAGE: int = 20
 
 
+@cache_page_with_holes(index_namespaces)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('group').all()
-    page_obj = create_page(posts,
-                           request.GET.get('page'),
-                           POSTS_ON_PAGE,
-                           'index_page')
+    posts = Post.objects.feed()
+    page_obj = paginate(request, posts, POSTS_ON_PAGE, INDEX_PAGE)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@cache_page_with_holes(group_namespaces)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = create_page(posts,
-                           request.GET.get('page'),
-                           POSTS_ON_PAGE,
-                           f'group_page_{slug}')
+    posts = group.posts.feed()
+    page_obj = paginate(request, posts, POSTS_ON_PAGE, group_page(group.pk))
     context = {
         'group': group,
         'page_obj': page_obj
@@ -35,32 +44,26 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_page_with_holes(profile_namespaces)
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    is_author = (user == request.user)
-    posts = Post.objects.filter(author=user)
-    following = False
-    page_obj = create_page(posts,
-                           request.GET.get('page'),
-                           POSTS_ON_PAGE,
-                           f'profile_page_{username}')
-    following = (request.user.is_authenticated
-                 and Follow.objects.filter(user=request.user,
-                                           author=user).exists())
+    user = get_object_or_404(User.objects.select_related('stats'),
+                             username=username)
+    posts = Post.objects.feed().filter(author=user)
+    page_obj = paginate(request, posts, POSTS_ON_PAGE, profile_page(user.pk))
     context = {
         'username': user,
         'page_obj': page_obj,
-        'following': following,
-        'is_author': is_author,
     }
     return render(request, template, context)
 
 
+@cache_page_with_holes(post_namespaces)
 def post_detail(request, post_id: int):
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.feed().select_related(
+        'author__stats'), pk=post_id)
+    comments = comments_page(request, post.pk, COMMENTS_ON_PAGE)
     form = CommentForm()
     context = {
         'post': post,
@@ -70,6 +73,32 @@ def post_detail(request, post_id: int):
     return render(request, template, context)
 
 
+@cache_page_with_holes(post_comments_namespaces)
+def post_comments(request, post_id: int):
+    """Следующая страница комментариев: фрагмент HTML для страницы
+    поста или JSON с ?format=json."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_page(request, post.pk, COMMENTS_ON_PAGE)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -110,7 +139,7 @@ def post_edit(request, post_id: int):
 
 @login_required
 def add_comment(request, post_id):
-    post = Post.objects.get(pk=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         form = form.save(commit=False)
@@ -120,32 +149,64 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@require_POST
+def add_comments(request):
+    """Пакет комментариев в JSON: ``{"comments": [{"post": id,
+    "text": "..."}, ...]}``. Сохраняется весь пакет или ничего.
+
+    Клиент входит через сессию, поэтому адрес защищён от CSRF, как и
+    формы: вместе с cookie csrftoken нужен заголовок X-CSRFToken с тем
+    же значением, иначе ответ - 403. Без входа ответ - 401 в JSON, а не
+    перенаправление на страницу входа.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти.'}, status=401)
+    try:
+        payloads = json.loads(request.body)['comments']
+    except (ValueError, TypeError, KeyError):
+        payloads = None
+    if not isinstance(payloads, list):
+        return JsonResponse({'error': 'Ожидается список comments.'},
+                            status=400)
+    if len(payloads) > bulk_comments.MAX_BATCH:
+        return JsonResponse({'error': (f'Не больше {bulk_comments.MAX_BATCH}'
+                                       ' комментариев.')}, status=400)
+    created, errors = bulk_comments.add_many(request.user, payloads)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    return JsonResponse({'created': created}, status=201)
+
+
 @login_required
 def follow_index(request):
-    user = request.user
-    posts = Post.objects.filter(author__following__user=user)
-    page_obj = create_page_not_cached(posts,
-                                      request.GET.get('page'),
-                                      POSTS_ON_PAGE)
+    posts = follow_feed(request.user)
+    page_obj = paginate(request, posts, POSTS_ON_PAGE, ordering=FEED_ORDERING)
     context = {'page_obj': page_obj, }
     return render(request, 'posts/index.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(Post.objects.feed(), query)
+    page_obj = paginate(request, posts, POSTS_ON_PAGE)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # Переходы по страницам должны сохранять запрос.
+        'page_query': urlencode({'q': query}),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if author != user and not Follow.objects.filter(user=user,
-                                                    author=author).exists():
-        Follow.objects.create(user=user, author=author)
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if Follow.objects.filter(user=user,
-                             author=author).exists():
-        Follow.objects.filter(user=user, author=author).delete()
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
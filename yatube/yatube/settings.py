@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.caches import cache_settings
+from core.database import database_settings
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -50,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы замерять запрос целиком (core.metrics).
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +69,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Шаблоны Django с замером времени отрисовки (core.metrics).
+        'BACKEND': 'core.metrics.InstrumentedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,11 +91,10 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Настройки базы берутся из переменных окружения DB_* (core.database),
+# без них используется SQLite в файле рядом с проектом.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_settings(BASE_DIR),
 }
 
 
@@ -144,8 +149,37 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Кэш задаётся переменными окружения CACHE_* (core.caches). Без отладки
+# процессы делят кэш в файлах, а частые ключи читают из своей памяти.
+# Набор авторов без раскладки постов (posts.feeds) меняется на месте,
+# и копии в памяти процесса у него быть не должно.
+CACHES = cache_settings(
+    BASE_DIR,
+    default='locmem' if DEBUG else 'file',
+    l1_bypass=('feed_celebrities',),
+)
+
+# Кэш готовых страниц лент (core.page_cache). При отладке он выключен:
+# страница из кэша не отрисовывает шаблоны и не даёт их контекст.
+# В ключ страницы входят только параметры запроса, которые читают views.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_PARAMS = ('page', 'cursor', 'format', 'q')
+
+# Миниатюры картинок постов готовит пул потоков (posts.thumbnails).
+# Без пула они создаются прямо в запросе: так делают только тесты,
+# чтобы фоновые задачи не писали во временный MEDIA_ROOT теста.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Загрузки пишутся во временные файлы, картинки проверяются по заголовку
+# (core.upload_handlers) и сохраняются уменьшенными (core.images).
+FILE_UPLOAD_HANDLERS = ['core.upload_handlers.StreamingImageUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 10000
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_STORED_SIDE = 1920
+
+# Метрики запросов (core.metrics) отдаются только с заголовком
+# "Authorization: Bearer <METRICS_TOKEN>"; без токена адреса нет.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')